@@ -6,33 +6,52 @@ A complete single-file FastAPI app with LangGraph workflows, user onboarding, an
 
 import os
 import json
+import logging
+import logging.handlers
 import base64
 import asyncio
+import fcntl
+import gzip
+import io
 import sqlite3
+import queue
 import re
+import hashlib
+import math
+import threading
+import time
 import traceback
+from contextlib import contextmanager
+from dataclasses import dataclass
 from datetime import datetime
-from typing import TypedDict, List, Dict, Optional, Any
-from uuid import uuid4
+from functools import cached_property, lru_cache
+from typing import Annotated, TypedDict, List, Dict, Iterable, Optional, Any
+from uuid import UUID, uuid4
 
 # FastAPI & Web Framework Imports
-from fastapi import FastAPI, HTTPException, WebSocket, WebSocketDisconnect, UploadFile, File, Form
+from fastapi import FastAPI, HTTPException, Request, WebSocket, WebSocketDisconnect, UploadFile, File, Form
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.middleware.gzip import GZipMiddleware
 from fastapi.staticfiles import StaticFiles
-from fastapi.responses import HTMLResponse, FileResponse, Response
+from fastapi.responses import HTMLResponse, FileResponse, Response, ORJSONResponse, StreamingResponse
 from pydantic import BaseModel
+from starlette.datastructures import Headers
 import uvicorn
 
 # Environment & Config
 from dotenv import load_dotenv
+from cachetools import TTLCache
+import orjson
+from PIL import Image, ImageOps
 
 # LangChain & LangGraph Imports
-from langchain_google_vertexai import ChatVertexAI
+from langchain_google_vertexai import ChatVertexAI, VertexAIEmbeddings
 from langchain_core.prompts import ChatPromptTemplate
-from langchain_core.output_parsers import StrOutputParser
 from langgraph.graph import StateGraph, END
-from langgraph.checkpoint.memory import InMemorySaver
-from langchain_core.messages import HumanMessage, AIMessage, BaseMessage
+from langgraph.graph.message import add_messages
+from langgraph.checkpoint.sqlite.aio import AsyncSqliteSaver
+import aiosqlite
+from langchain_core.messages import HumanMessage, AIMessage, BaseMessage, RemoveMessage
 # Removed GenAITool import; using ChatVertexAI.bind_tools for tool bindings
 from google import genai
 from google.genai import types, errors as genai_errors
@@ -45,22 +64,137 @@ load_dotenv()
 
 # Validate required environment variables
 
+# LangGraph checkpoints live in SQLite so every uvicorn worker sees the same conversation state
+CHECKPOINT_DB_PATH = os.environ.get("CHECKPOINT_DB_PATH", "checkpoints.db")
+CHECKPOINT_PRUNE_INTERVAL_SECONDS = int(os.environ.get("CHECKPOINT_PRUNE_INTERVAL_SECONDS", "3600"))
+# Conversation threads idle for longer than this are deleted outright (profiles are kept)
+CHECKPOINT_THREAD_TTL_DAYS = float(os.environ.get("CHECKPOINT_THREAD_TTL_DAYS", "30"))
+
+# Profiles are read on nearly every turn but rarely change; keep a bounded LRU with a short TTL
+PROFILE_CACHE_SIZE = int(os.environ.get("PROFILE_CACHE_SIZE", "512"))
+PROFILE_CACHE_TTL_SECONDS = float(os.environ.get("PROFILE_CACHE_TTL_SECONDS", "60"))
+
+# Image descriptions depend only on (prompt, profile); identical requests reuse the text
+DESCRIPTION_CACHE_SIZE = int(os.environ.get("DESCRIPTION_CACHE_SIZE", "512"))
+DESCRIPTION_CACHE_TTL_SECONDS = float(os.environ.get("DESCRIPTION_CACHE_TTL_SECONDS", "1800"))
+
+# Uploaded originals and generated edits are kept on local disk
+UPLOADS_DIR = os.path.join(os.getcwd(), "uploads")
+EDITED_DIR = os.path.join(os.getcwd(), "edited")
+
+# Image generation is slow and holds whole images in memory; cap concurrent calls per worker
+# and fail fast instead of queueing a burst indefinitely
+IMAGE_EDIT_CONCURRENCY = int(os.environ.get("IMAGE_EDIT_CONCURRENCY", "4"))
+IMAGE_EDIT_QUEUE_TIMEOUT_SECONDS = float(os.environ.get("IMAGE_EDIT_QUEUE_TIMEOUT_SECONDS", "30"))
+# Description LLM calls (cache misses only) get their own, smaller cap
+DESCRIPTION_CONCURRENCY = int(os.environ.get("DESCRIPTION_CONCURRENCY", "2"))
+
+# Uploads are checked before they reach the model; larger photos are downscaled so the
+# model (and our own encoding) handles fewer bytes
+ALLOWED_IMAGE_TYPES = {"image/jpeg", "image/png", "image/webp"}
+# File extension for image MIME types we upload or get back from the model
+IMAGE_MIME_EXTENSIONS = {"image/png": ".png", "image/jpeg": ".jpg", "image/jpg": ".jpg", "image/webp": ".webp"}
+MAX_UPLOAD_BYTES = int(os.environ.get("MAX_UPLOAD_BYTES", str(10 * 1024 * 1024)))
+MAX_IMAGE_DIMENSION = int(os.environ.get("MAX_IMAGE_DIMENSION", "2048"))
+# A small, highly compressed file can still decode to hundreds of MB; anything above this
+# many pixels is rejected before decoding (Pillow's own limit is ~178M and only warns)
+MAX_IMAGE_PIXELS = int(os.environ.get("MAX_IMAGE_PIXELS", str(50_000_000)))
+Image.MAX_IMAGE_PIXELS = MAX_IMAGE_PIXELS
+UPLOAD_READ_CHUNK_BYTES = 256 * 1024
+
+
+@dataclass(frozen=True)
+class ImageGenConfig:
+    """Image generation settings; resolved once since the environment is fixed per process."""
+    image_model: str
+    region: str
+    project: Optional[str]
+    fallback_locations: tuple = ("global", "us-central1")
+    alt_models: tuple = ("imagen-3.0-generate-001", "gemini-2.0-flash-exp")
+
+    @classmethod
+    def from_env(cls) -> "ImageGenConfig":
+        return cls(
+            image_model=os.environ.get("GEMINI_IMAGE_MODEL", "gemini-2.5-flash-image-preview"),
+            region=os.environ.get("GOOGLE_CLOUD_REGION") or os.environ.get("LOCATION") or "us-central1",
+            project=os.environ.get("GOOGLE_CLOUD_PROJECT") or os.environ.get("PROJECT_ID"),
+            fallback_locations=(os.environ.get("LOCATION") or "global", "us-central1"),
+        )
+
+
+IMAGE_GEN_CONFIG = ImageGenConfig.from_env()
+
+# Request handlers only enqueue log records; a listener thread does the actual stream writes
+LOG_LEVEL = os.environ.get("LOG_LEVEL", "INFO").upper()
+logger = logging.getLogger("agentic_fastapi_app")
+logger.setLevel(LOG_LEVEL)
+logger.propagate = False
+_log_queue: "queue.SimpleQueue[logging.LogRecord]" = queue.SimpleQueue()
+_log_stream_handler = logging.StreamHandler()
+_log_stream_handler.setFormatter(logging.Formatter("%(asctime)s %(levelname)s %(name)s: %(message)s"))
+logger.addHandler(logging.handlers.QueueHandler(_log_queue))
+_log_listener = logging.handlers.QueueListener(_log_queue, _log_stream_handler, respect_handler_level=True)
+_log_listener.start()
+
 # =======================
 # 2. FASTAPI APP SETUP
 # =======================
 
 app = FastAPI(
     title="Assistant",
-    version="2.0.0"
+    version="2.0.0",
+    default_response_class=ORJSONResponse,  # orjson is considerably faster than the stdlib encoder
 )
 
-# Enable CORS for frontend connectivity
+# Only these are worth compressing; images (the bulk of our bytes) are already compressed
+COMPRESSIBLE_CONTENT_TYPES = ("text/", "application/json", "application/javascript", "application/x-ndjson")
+
+
+class TextGZipMiddleware:
+    """GZipMiddleware limited to COMPRESSIBLE_CONTENT_TYPES.
+
+    Other responses bypass the gzip middleware entirely, so they are sent untouched
+    (no event-loop compression, Content-Length kept).
+    """
+
+    def __init__(self, app, minimum_size: int = 500, compresslevel: int = 9) -> None:
+        self.app = app
+        self.minimum_size = minimum_size
+        self.compresslevel = compresslevel
+
+    async def __call__(self, scope, receive, send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        async def route(scope, receive, gzip_send) -> None:
+            target = gzip_send
+
+            async def send_routed(message) -> None:
+                nonlocal target
+                if message["type"] == "http.response.start":
+                    content_type = Headers(raw=message["headers"]).get("content-type", "")
+                    target = gzip_send if content_type.startswith(COMPRESSIBLE_CONTENT_TYPES) else send
+                await target(message)
+
+            await self.app(scope, receive, send_routed)
+
+        await GZipMiddleware(route, self.minimum_size, self.compresslevel)(scope, receive, send)
+
+
+# Compress text payloads (backstories, summaries, media listings); WebSockets are unaffected
+app.add_middleware(TextGZipMiddleware, minimum_size=512, compresslevel=5)
+
+# Enable CORS for frontend connectivity; set CORS_ALLOW_ORIGINS to a comma-separated list in production.
+# Credentials are only allowed for an explicit list, never together with the "*" default.
+CORS_ALLOW_ORIGINS = [o.strip() for o in os.environ.get("CORS_ALLOW_ORIGINS", "*").split(",") if o.strip()]
 app.add_middleware(
     CORSMiddleware,
-    allow_origins=["*"],  # Configure appropriately for production
-    allow_credentials=True,
+    allow_origins=CORS_ALLOW_ORIGINS,
+    allow_credentials="*" not in CORS_ALLOW_ORIGINS,
     allow_methods=["*"],
     allow_headers=["*"],
+    max_age=600,  # let browsers cache preflight responses
 )
 
 # =======================
@@ -92,6 +226,20 @@ class UserProfile(BaseModel):
     brand_style: Optional[str] = None
     backstory: Optional[str] = None
 
+USER_PROFILE_FIELDS = tuple(UserProfile.model_fields)
+
+class ExtractedProfile(BaseModel):
+    """Response schema for onboarding extraction; Gemini returns it as native JSON."""
+    name: Optional[str] = None
+    state: Optional[str] = None
+    craft_type: Optional[str] = None
+    materials: Optional[str] = None
+    years_experience: Optional[str] = None
+    sales_channels: Optional[str] = None
+    price_range: Optional[str] = None
+    languages: Optional[str] = None
+    brand_style: Optional[str] = None
+
 class NotificationResponse(BaseModel):
     user_id: str
     notifications: List[Dict[str, str]]
@@ -103,7 +251,9 @@ class NotificationResponse(BaseModel):
 
 class AgentState(TypedDict):
     """Enhanced state for the agentic workflow."""
-    messages: List[BaseMessage]
+    # add_messages appends node output to the checkpointed history, so nodes and callers
+    # pass only new messages instead of copying the whole list on every step
+    messages: Annotated[List[BaseMessage], add_messages]
     user_id: str
     # Onboarding-specific state
     is_onboarding: bool
@@ -142,98 +292,224 @@ def coerce_profile_to_strings(profile: Optional[Dict]) -> Dict[str, str]:
             continue
     return result
 
+def write_bytes(path: str, data: bytes) -> None:
+    """Write data to path; meant to be run via asyncio.to_thread from handlers."""
+    with open(path, "wb") as f:
+        f.write(data)
+
+def read_bytes(path: str) -> bytes:
+    """Read a whole file; meant to be run via asyncio.to_thread from handlers."""
+    with open(path, "rb") as f:
+        return f.read()
+
+def write_bytes_if_missing(path: str, data: bytes) -> None:
+    """Like write_bytes, but leaves an existing file alone (content-addressed paths)."""
+    try:
+        with open(path, "xb") as f:
+            f.write(data)
+    except FileExistsError:
+        pass
+
+def prepare_upload_image(data: bytes) -> tuple:
+    """Decode an uploaded image and downscale it to MAX_IMAGE_DIMENSION on its longest side.
+
+    Returns (bytes, mime) as sent to the model; the format is taken from the file itself,
+    not the client's Content-Type. Raises ValueError for anything that is not a
+    JPEG, PNG or WebP image. CPU-bound, so run it via asyncio.to_thread.
+    """
+    try:
+        img = Image.open(io.BytesIO(data))
+        fmt = img.format
+    except Exception as e:
+        raise ValueError(f"Unreadable image: {e}")
+    mime = Image.MIME.get(fmt or "")
+    if mime not in ALLOWED_IMAGE_TYPES:
+        raise ValueError(f"Unsupported image format: {fmt}")
+    if img.width * img.height > MAX_IMAGE_PIXELS:
+        raise ValueError(f"Image exceeds {MAX_IMAGE_PIXELS} pixels")
+    if max(img.size) <= MAX_IMAGE_DIMENSION:
+        return data, mime
+    # Pixel data is only decoded here, so truncated or corrupt files fail here too.
+    # Re-saving drops EXIF, so the Orientation tag is applied to the pixels first.
+    try:
+        img = ImageOps.exif_transpose(img)
+        img.thumbnail((MAX_IMAGE_DIMENSION, MAX_IMAGE_DIMENSION))
+        buf = io.BytesIO()
+        if fmt == "PNG":
+            img.save(buf, fmt, optimize=True)
+        else:
+            img.save(buf, fmt, quality=88)
+    except Exception as e:
+        raise ValueError(f"Unreadable image: {e}")
+    return buf.getvalue(), mime
+
+def message_text(message: BaseMessage) -> str:
+    """Return the text of a chat model reply; Gemini may return a list of content parts."""
+    content = message.content
+    if isinstance(content, str):
+        return content
+    return "".join(
+        part if isinstance(part, str) else part.get("text", "")
+        for part in content
+        if isinstance(part, (str, dict))
+    )
+
+def first_int(text: str) -> Optional[str]:
+    """Return the first run of digits in text (e.g. '10' from 'about 10 years'), or None."""
+    i, n = 0, len(text)
+    while i < n and not text[i].isdigit():
+        i += 1
+    j = i
+    while j < n and text[j].isdigit():
+        j += 1
+    return text[i:j] or None
+
 # =======================
-# 5. WORKFLOW NODES (MOVED BEFORE WORKFLOW CONSTRUCTION)
+# 4.6. SEMANTIC RESPONSE CACHE
 # =======================
 
-def check_user_profile_node(state: AgentState) -> dict:
-    """Checks if a user profile exists and sets initial state, preserving partial data."""
-    user_id = state.get('user_id')
-    if not user_id:
-        return {"error": "User ID not found in state"}
+class SemanticCache:
+    """In-process semantic cache for LLM responses.
 
-    # Check for a completed profile in SQLite
+    Entries are bucketed by (intent, profile_hash) and matched by cosine similarity
+    of unit-normalized query embeddings, so paraphrased questions from users with the
+    same profile reuse a stored answer instead of making another LLM call.
+    """
+
+    def __init__(self, threshold: float = 0.92, ttl_seconds: float = 3600, max_entries_per_bucket: int = 256):
+        self.threshold = threshold
+        self.ttl_seconds = ttl_seconds
+        self.max_entries_per_bucket = max_entries_per_bucket
+        self._buckets: Dict[tuple, List[tuple]] = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def profile_hash(profile_json: str) -> str:
+        """Stable hash of the sanitized profile JSON, used to keep answers user-context specific."""
+        return hashlib.sha256(profile_json.encode("utf-8")).hexdigest()
+
+    @staticmethod
+    def normalize(vec: List[float]) -> List[float]:
+        norm = math.sqrt(sum(x * x for x in vec))
+        return [x / norm for x in vec] if norm else list(vec)
+
+    def lookup(self, intent: str, profile_hash: str, vec: List[float]) -> Optional[str]:
+        """Return the best cached response with similarity >= threshold, if any."""
+        now = time.monotonic()
+        best_response, best_score = None, self.threshold
+        with self._lock:
+            entries = self._buckets.get((intent, profile_hash))
+            if not entries:
+                return None
+            # Drop expired entries while we are here
+            entries[:] = [e for e in entries if e[0] > now]
+            for _, cached_vec, response in entries:
+                score = sum(a * b for a, b in zip(vec, cached_vec))
+                if score >= best_score:
+                    best_response, best_score = response, score
+        return best_response
+
+    def store(self, intent: str, profile_hash: str, vec: List[float], response: str) -> None:
+        expires_at = time.monotonic() + self.ttl_seconds
+        with self._lock:
+            entries = self._buckets.setdefault((intent, profile_hash), [])
+            entries.append((expires_at, vec, response))
+            if len(entries) > self.max_entries_per_bucket:
+                del entries[: len(entries) - self.max_entries_per_bucket]
+
+class CircuitOpenError(Exception):
+    """Raised instead of calling an upstream whose circuit is open."""
+
+
+class CircuitBreaker:
+    """Per-key circuit breaker for upstream model calls.
+
+    A key opens after `failure_threshold` failures within `window_seconds`, and calls for
+    it are refused for `open_seconds`. After that one trial call is let through
+    (half-open): success closes the key, another failure re-opens it.
+    """
+
+    def __init__(self, failure_threshold: int = 5, window_seconds: float = 60, open_seconds: float = 30):
+        self.failure_threshold = failure_threshold
+        self.window_seconds = window_seconds
+        self.open_seconds = open_seconds
+        self._failures: Dict[str, List[float]] = {}
+        self._opened_at: Dict[str, float] = {}
+        self._lock = threading.Lock()
+
+    def allow(self, key: str) -> bool:
+        now = time.monotonic()
+        with self._lock:
+            opened_at = self._opened_at.get(key)
+            if opened_at is None:
+                return True
+            if now - opened_at < self.open_seconds:
+                return False
+            # Half-open: re-arm the timer so only this caller gets the trial
+            self._opened_at[key] = now
+            return True
+
+    def record_success(self, key: str) -> None:
+        with self._lock:
+            self._failures.pop(key, None)
+            self._opened_at.pop(key, None)
+
+    def record_failure(self, key: str) -> None:
+        now = time.monotonic()
+        with self._lock:
+            if key in self._opened_at:
+                # The half-open trial failed
+                self._opened_at[key] = now
+                return
+            recent = [t for t in self._failures.get(key, ()) if now - t < self.window_seconds]
+            recent.append(now)
+            if len(recent) >= self.failure_threshold:
+                self._opened_at[key] = now
+                self._failures.pop(key, None)
+            else:
+                self._failures[key] = recent
+
+class SingleFlight:
+    """Coalesces concurrent calls with the same key onto one in-flight task."""
+
+    def __init__(self):
+        self._inflight: Dict[Any, asyncio.Future] = {}
+
+    async def run(self, key, factory):
+        """Await factory() for key, or the task already running for it."""
+        task = self._inflight.get(key)
+        if task is None:
+            # No await between the lookup and the insert, so no lock is needed
+            task = self._inflight[key] = asyncio.ensure_future(factory())
+            task.add_done_callback(lambda t: self._finished(key, t))
+        # Shielded: one caller disconnecting must not cancel the others' result
+        return await asyncio.shield(task)
+
+    def _finished(self, key, task: asyncio.Future) -> None:
+        self._inflight.pop(key, None)
+        if not task.cancelled():
+            task.exception()  # mark as retrieved even if every caller went away
+
+async def embed_query_for_cache(query: str) -> Optional[List[float]]:
+    """Embed a query for the semantic cache; returns None if embeddings are unavailable."""
+    embedder = getattr(services, 'embedder', None)
+    if not embedder or not query:
+        return None
     try:
-        stored_profile = services.store.get_user_profile(user_id)
-        profile_exists = stored_profile is not None
+        return SemanticCache.normalize(await embedder.aembed_query(query))
     except Exception as e:
-        print(f"Error accessing store: {e}")
-        profile_exists = False
-    
-    print(f"Profile check for user {user_id}: exists = {profile_exists}")
-    
-    if profile_exists and stored_profile:
-        # Profile is complete, onboarding is done.
-        return {
-            "user_id": user_id,
-            "is_onboarding": False,
-            "user_profile_data": stored_profile,
-            "messages": state.get('messages', [])
-        }
-    else:
-        # No completed profile. We are in onboarding.
-        partial_profile = state.get('user_profile_data', {})
-        print(f"Onboarding active. Current partial profile: {partial_profile}")
-        
-        # Check if this is a completely new user (no messages yet)
-        messages = state.get('messages', [])
-        is_new_user = len([msg for msg in messages if isinstance(msg, HumanMessage)]) <= 1 and not partial_profile
-        
-        if is_new_user:
-            welcome_message = "Welcome! I'm your artisan brand assistant. I'll help you set up your craft profile, craft a compelling backstory, and support your content. Let's start simple — what should I call you or your brand?"
-            return {
-                "user_id": user_id,
-                "is_onboarding": True,
-                "user_profile_data": partial_profile,
-                "messages": messages + [AIMessage(content=welcome_message)],
-                "final_response_text": welcome_message
-            }
-        
-        return {
-            "user_id": user_id,
-            "is_onboarding": True,
-            "user_profile_data": partial_profile,
-            "messages": state.get('messages', [])
-        }
-
-def onboarding_step_node(state: AgentState) -> dict:
-    """Handles interactive user onboarding for artisan profiling and setup."""
-    if not state.get('is_onboarding'):
-        return {"is_onboarding": False}
+        logger.warning("Embedding for semantic cache failed: %s", e)
+        return None
 
-    current_profile = state.get('user_profile_data', {})
-    user_id = state['user_id']
-    messages = state.get('messages', [])
-    
-    # Define artisan-specific fields
-    required_fields = [
-        "name",
-        "state",
-        "craft_type",
-        "materials",
-        "years_experience",
-        "sales_channels",
-        "price_range",
-        "languages",
-        "brand_style"
-    ]
-    
-    # Get the most recent human message if available (welcome AI message may be last)
-    user_message = ""
-    if messages:
-        for m in reversed(messages):
-            if isinstance(m, HumanMessage):
-                user_message = m.content
-                break
-        
-    extraction_prompt = ChatPromptTemplate.from_template("""
-You are an expert data extractor for an Indian artisan platform. Your goal is to intelligently extract profile information from user messages. Users may respond in English, Hindi, Hinglish, or other regional languages.
+# =======================
+# 4.7. PROMPTS
+# =======================
+# Static instructions live in system messages and dynamic fields come last, so every
+# call shares a byte-identical prefix that Gemini can serve from its prompt cache.
 
-Your instructions are to be flexible, understand the intent behind the words, and not fail due to minor spelling errors or variations in phrasing. Return ONLY a JSON object with the extracted data.
+EXTRACTION_SYSTEM_PROMPT = """You are an expert data extractor for an Indian artisan platform. Your goal is to intelligently extract profile information from user messages. Users may respond in English, Hindi, Hinglish, or other regional languages.
 
-Current profile: {current_profile}
-User message: {user_message}
-Missing fields: {missing_fields}
+Your instructions are to be flexible, understand the intent behind the words, and not fail due to minor spelling errors or variations in phrasing.
 
 Fields to Extract (with examples)
 
@@ -293,118 +569,335 @@ Behavior and Normalization Rules
 
     Multi-field Extraction: If a user provides multiple pieces of information in one sentence (e.g., "Main Ravi, UP se, aur lakdi ka kaam karta hoon 10 saal se"), extract name, state, craft_type, and years_experience all at once.
  Only use strings dont make any dictionary or list.
-Return a valid JSON object only. If no new information is found, return {{}} if nothing found.
-""")
+Leave a field empty if it is not mentioned.
+"""
+
+BACKSTORY_SYSTEM_PROMPT = """
+You are a brand storyteller. Create a compelling artisan backstory from the details provided.
+
+Write in simple, sincere language. Avoid clichés and marketing fluff.
+Output exactly one sections in this format (no extra text):
+
+
+
+"""
+
+BACKSTORY_DETAILS_TEMPLATE = """Details:
+Name/Brand: {name}
+State/Region: {state}
+Craft: {craft}
+Materials: {materials}
+Experience (years): {years}
+Sales Channels: {channels}
+Brand Style: {style}
+Languages: {languages}"""
+
+INTENT_SYSTEM_PROMPT = """
+Classify user intent for welfare scheme assistance:
+
+Intents:
+- 'welfare_search': Questions about government schemes, benefits, eligibility
+- 'general_query': Other questions
+
+Respond with intent only.
+"""
+
+WELFARE_SUMMARY_SYSTEM_PROMPT = """
+Provide a natural, conversational answer about welfare schemes based on search results.
+Sound like you're speaking to someone naturally, without emojis, bullet points, or technical formatting.
+Keep response under 150 words and focus on practical information about eligibility and benefits.
+
+Provide a friendly, helpful answer that sounds natural when spoken aloud.
+"""
+
+GENERAL_QUERY_SYSTEM_PROMPT = """
+Answer naturally and conversationally, as if speaking to someone in person.
+Remove all emojis, bullet points, and formatting. Keep response under 100 words.
+Sound natural and helpful when spoken aloud.
+
+Provide a friendly, natural spoken response focused on welfare schemes if relevant.
+"""
+
+IMAGE_DESCRIPTION_SYSTEM_PROMPT = """
+You are an assistant helping an Indian artisan describe a product photo for social media and catalog listings.
+Keep it short (35-60 words), warm, and authentic. Mention craft, materials, region or style if helpful. No emojis.
+
+Write a single paragraph product description suitable for e-commerce and Instagram.
+"""
+
+FALLBACK_DESCRIPTION_SYSTEM_PROMPT = """
+Write a concise, warm product description (35-60 words) for an artisan's image based on the prompt and profile. No emojis.
+"""
+
+# Templates are built once at import and shared by every call
+_EXTRACTION_PROMPT = ChatPromptTemplate.from_messages([
+    ("system", EXTRACTION_SYSTEM_PROMPT),
+    ("human", "Current profile: {current_profile}\nMissing fields: {missing_fields}\nUser message: {user_message}"),
+])
+_BACKSTORY_PROMPT = ChatPromptTemplate.from_messages([
+    ("system", BACKSTORY_SYSTEM_PROMPT),
+    ("human", BACKSTORY_DETAILS_TEMPLATE),
+])
+_INTENT_PROMPT = ChatPromptTemplate.from_messages([
+    ("system", INTENT_SYSTEM_PROMPT),
+    ("human", "User Profile: {user_profile}\nQuery: {query}"),
+])
+_WELFARE_SUMMARY_PROMPT = ChatPromptTemplate.from_messages([
+    ("system", WELFARE_SUMMARY_SYSTEM_PROMPT),
+    ("human", "User Profile: {profile}\nSearch Results: {results}\nQuery: {query}"),
+])
+_GENERAL_QUERY_PROMPT = ChatPromptTemplate.from_messages([
+    ("system", GENERAL_QUERY_SYSTEM_PROMPT),
+    ("human", "User Profile: {user_profile}\nQuestion: {question}"),
+])
+_IMAGE_DESCRIPTION_PROMPT = ChatPromptTemplate.from_messages([
+    ("system", IMAGE_DESCRIPTION_SYSTEM_PROMPT),
+    ("human", "User Profile (for context): {profile}\nInstruction or Prompt used: {prompt}"),
+])
+_FALLBACK_DESCRIPTION_PROMPT = ChatPromptTemplate.from_messages([
+    ("system", FALLBACK_DESCRIPTION_SYSTEM_PROMPT),
+    ("human", "Profile: {profile}\nPrompt: {prompt}"),
+])
+
+# Default /image/edit instruction when the caller sends no prompt
+DEFAULT_IMAGE_EDIT_PROMPT = (
+    "Edit/enhance this photo for {name}, a {craft} artisan{region_clause}."
+    " Keep the style {style}. Improve lighting and colors, keep it authentic, no text or watermarks. "
+    "Do not change the main product in the image—just make it look better. "
+    "Change or enhance the background so it matches the type of product and looks suitable for advertising but not make it completely different."
+    "Make it suitable for use on an e-commerce website. and look like a product photo taken from dslr"
+)
+
+
+@lru_cache(maxsize=256)
+def default_image_edit_prompt(name: str, craft: str, style: str, region: str = "") -> str:
+    """Render DEFAULT_IMAGE_EDIT_PROMPT; repeat uploads from the same profile hit the cache."""
+    return DEFAULT_IMAGE_EDIT_PROMPT.format_map({
+        "name": name,
+        "craft": craft,
+        "style": style,
+        "region_clause": f" from {region}" if region else "",
+    })
+
+# Precompiled patterns; obvious welfare queries are routed without an LLM call
+_WELFARE_KEYWORDS_RE = re.compile(r"\b(scheme|schemes|welfare|benefit|benefits|yojana|subsidy|pmkisan)\b", re.IGNORECASE)
+_BACKSTORY_RE = re.compile(r"Backstory:\s*(.+?)(?:\n\s*Tagline:|$)", re.DOTALL | re.IGNORECASE)
+_TAGLINE_RE = re.compile(r"Tagline:\s*(.+)$", re.DOTALL | re.IGNORECASE)
+_DATA_URI_B64_RE = re.compile(r'data:(image/[^;]+);base64,([A-Za-z0-9+/=]+)')
+_B64_RUN_RE = re.compile(r'[A-Za-z0-9+/=]+')
+# Only this much of a response's repr is searched when the structured walk finds no image
+DATA_URI_SEARCH_LIMIT = 16384
+
+# =======================
+# 5. WORKFLOW NODES (MOVED BEFORE WORKFLOW CONSTRUCTION)
+# =======================
+
+async def check_user_profile_node(state: AgentState) -> dict:
+    """Checks if a user profile exists and sets initial state, preserving partial data."""
+    user_id = state.get('user_id')
+    if not user_id:
+        return {"error": "User ID not found in state"}
+
+    # Check for a completed profile in SQLite
+    try:
+        stored_profile = await asyncio.to_thread(services.store.get_user_profile, user_id)
+        profile_exists = stored_profile is not None
+    except Exception as e:
+        print(f"Error accessing store: {e}")
+        profile_exists = False
+    
+    print(f"Profile check for user {user_id}: exists = {profile_exists}")
+    
+    if profile_exists and stored_profile:
+        # Profile is complete, onboarding is done.
+        return {
+            "user_id": user_id,
+            "is_onboarding": False,
+            "user_profile_data": stored_profile
+        }
+    else:
+        # No completed profile. We are in onboarding.
+        partial_profile = state.get('user_profile_data', {})
+        print(f"Onboarding active. Current partial profile: {partial_profile}")
+        
+        # Check if this is a completely new user (no messages yet)
+        messages = state.get('messages', [])
+        # Only need to know whether there is more than one human message; stop counting at two
+        human_count = 0
+        for msg in messages:
+            if isinstance(msg, HumanMessage):
+                human_count += 1
+                if human_count > 1:
+                    break
+        is_new_user = human_count <= 1 and not partial_profile
         
-    missing_fields_for_prompt = [field for field in required_fields if field not in current_profile]
+        if is_new_user:
+            welcome_message = "Welcome! I'm your artisan brand assistant. I'll help you set up your craft profile, craft a compelling backstory, and support your content. Let's start simple — what should I call you or your brand?"
+            return {
+                "user_id": user_id,
+                "is_onboarding": True,
+                "user_profile_data": partial_profile,
+                "messages": [AIMessage(content=welcome_message)],
+                "final_response_text": welcome_message
+            }
+        
+        return {
+            "user_id": user_id,
+            "is_onboarding": True,
+            "user_profile_data": partial_profile
+        }
 
-    extraction_chain = extraction_prompt | services.llm_gemini.bind_tools([{"google_search": {}}]) | StrOutputParser()
+async def generate_backstory(profile: Dict) -> Optional[str]:
+    """Generates the artisan backstory (with tagline, if present) from a completed profile."""
+    try:
+        raw_backstory = message_text(await services.backstory_chain.ainvoke({
+            "name": profile.get('name', ''),
+            "state": profile.get('state', ''),
+            "craft": profile.get('craft_type', ''),
+            "materials": profile.get('materials', ''),
+            "years": profile.get('years_experience', ''),
+            "channels": profile.get('sales_channels', ''),
+            "style": profile.get('brand_style', ''),
+            "languages": profile.get('languages', ''),
+        })).strip()
+    except Exception as e:
+        print(f"Backstory generation failed: {e}")
+        return None
+
+    # Parse into Backstory and Tagline if possible
+    bs_match = _BACKSTORY_RE.search(raw_backstory)
+    tl_match = _TAGLINE_RE.search(raw_backstory)
+    backstory_section = bs_match.group(1).strip() if bs_match else raw_backstory
+    tagline_section = tl_match.group(1).strip() if tl_match else ""
+
+    # Keep the tagline at the end of the backstory for convenience
+    return backstory_section + (f"\n\nTagline: {tagline_section}" if tagline_section else "")
+
+# Artisan-specific fields collected during onboarding, in the order they are asked
+REQUIRED_PROFILE_FIELDS = (
+    "name",
+    "state",
+    "craft_type",
+    "materials",
+    "years_experience",
+    "sales_channels",
+    "price_range",
+    "languages",
+    "brand_style",
+)
+
+# Field-specific prompts for artisans
+ONBOARDING_FIELD_PROMPTS = {
+    "name": "What should I call your brand or what's your name?",
+    "state": "Which state/region in India are you based in?",
+    "craft_type": "What craft do you practice? (e.g., pottery, weaving, woodwork)",
+    "materials": "What materials do you mostly use? (e.g., clay, cotton, bamboo)",
+    "years_experience": "How many years have you been practicing this craft?",
+    "sales_channels": "Where do you usually sell? Online, offline, or both?",
+    "price_range": "What's your typical price range? (e.g., Rs 200-500, premium)",
+    "languages": "Which languages do you speak or want content in?",
+    "brand_style": "How would you describe your brand style or voice? (e.g., earthy, premium)",
+}
+
+# Short labels used when several fields are asked for in one question
+ONBOARDING_FIELD_LABELS = {
+    "name": "name or brand name",
+    "state": "state/region",
+    "craft_type": "craft",
+    "materials": "main materials",
+    "years_experience": "years of experience",
+    "sales_channels": "where you sell (online, offline, or both)",
+    "price_range": "typical price range",
+    "languages": "languages you speak",
+    "brand_style": "brand style",
+}
+
+def missing_profile_fields(profile: Dict) -> tuple:
+    """Required fields that are absent or empty in the profile, in asking order."""
+    return tuple(f for f in REQUIRED_PROFILE_FIELDS if not profile.get(f))
+
+async def onboarding_step_node(state: AgentState) -> dict:
+    """Handles interactive user onboarding for artisan profiling and setup."""
+    if not state.get('is_onboarding'):
+        return {"is_onboarding": False}
+
+    current_profile = state.get('user_profile_data', {})
+    user_id = state['user_id']
+    messages = state.get('messages', [])
+    
+    # Get the most recent human message if available (welcome AI message may be last)
+    user_message = ""
+    if messages:
+        for m in reversed(messages):
+            if isinstance(m, HumanMessage):
+                user_message = m.content
+                break
+        
+    missing_fields_for_prompt = missing_profile_fields(current_profile)
+
+    # Fast path: fewer than three missing fields means the last question asked for exactly
+    # one field, so a short literal answer can be stored without an extraction LLM call
+    answered_directly = False
+    if user_message and 0 < len(missing_fields_for_prompt) < 3:
+        next_field = missing_fields_for_prompt[0]
+        answer = user_message.strip()
+        if answer and len(answer.split()) <= 4 and "," not in answer:
+            value = first_int(answer) if next_field == 'years_experience' else answer
+            if value:
+                current_profile[next_field] = value
+                answered_directly = True
+                logger.debug("Direct answer for %s", next_field)
 
     # Only attempt extraction if we have a human message
-    if user_message:
+    if user_message and not answered_directly:
         try:
-            response_str = extraction_chain.invoke({
+            extracted = await services.extraction_chain.ainvoke({
                 "current_profile": json.dumps(sanitize_profile(current_profile)),
                 "user_message": user_message,
                 "missing_fields": json.dumps(missing_fields_for_prompt)
             })
-
-            # Clean and parse the JSON response
-            json_match = re.search(r'\{.*\}', response_str, re.DOTALL)
-            if json_match:
-                extracted_data = json.loads(json_match.group())
-                current_profile.update(extracted_data)
-                print(f"Extracted profile data: {extracted_data}")
-            else:
-                # Fallback: Try to extract simple responses manually for years_experience
-                user_message_lower = user_message.lower().strip()
-                if len(missing_fields_for_prompt) > 0 and missing_fields_for_prompt[0] == 'years_experience':
-                    numbers = re.findall(r'\d+', user_message)
-                    if numbers:
-                        current_profile['years_experience'] = numbers[0]
-                        print(f"Fallback: Extracted years_experience = {numbers[0]}")
-        except (json.JSONDecodeError, Exception) as e:
+            extracted_data = {k: v for k, v in extracted.model_dump(exclude_none=True).items() if v.strip()}
+            current_profile.update(extracted_data)
+            print(f"Extracted profile data: {extracted_data}")
+        except Exception as e:
             print(f"Error extracting profile data: {e}")
-            # Final fallback for simple responses when we do have a user message
-            if user_message:
-                if len(missing_fields_for_prompt) > 0:
-                    next_field = missing_fields_for_prompt[0]
-                    if next_field == 'years_experience':
-                        numbers = re.findall(r'\d+', user_message)
-                        if numbers:
-                            current_profile['years_experience'] = numbers[0]
-                            print(f"Final fallback: years_experience = {numbers[0]}")
+            # Fallback for simple responses when the extraction call itself fails
+            if len(missing_fields_for_prompt) > 0:
+                next_field = missing_fields_for_prompt[0]
+                if next_field == 'years_experience':
+                    years = first_int(user_message)
+                    if years:
+                        current_profile['years_experience'] = years
+                        print(f"Final fallback: years_experience = {years}")
 
     # Check what's still missing
-    missing_fields = [field for field in required_fields if field not in current_profile or not current_profile[field]]
+    missing_fields = missing_profile_fields(current_profile)
     
     # If nothing is missing, onboarding is complete
     if not missing_fields:
-        services.store.save_user_profile(user_id, current_profile)
         name = current_profile.get('name', 'there')
         final_text = f"Great! {name}, your artisan profile is set."
 
-        # Auto-generate backstory once if not already present
-        try:
-            stored = services.store.get_user_profile(user_id) or {}
-            existing_backstory = stored.get('backstory')
-        except Exception:
-            existing_backstory = None
-
+        # Auto-generate backstory once if not already present, concurrently with the profile write
+        save_profile = asyncio.to_thread(services.store.save_user_profile, user_id, current_profile)
         backstory_text = None
-        if not existing_backstory:
-            backstory_prompt = ChatPromptTemplate.from_template(
-                """
-You are a brand storyteller. Create a compelling artisan backstory.
-
-Details:
-Name/Brand: {name}
-State/Region: {state}
-Craft: {craft}
-Materials: {materials}
-Experience (years): {years}
-Sales Channels: {channels}
-Brand Style: {style}
-Languages: {languages}
-
-Write in simple, sincere language. Avoid clichés and marketing fluff.
-Output exactly one sections in this format (no extra text):
-
-
+        if current_profile.get('backstory'):
+            await save_profile
+        else:
+            backstory_text, _ = await asyncio.gather(generate_backstory(current_profile), save_profile)
 
-"""
-            )
-            chain = backstory_prompt | services.llm_gemini.bind_tools([{"google_search": {}}]) | StrOutputParser()
+        if backstory_text:
             try:
-                raw_backstory = chain.invoke({
-                    "name": current_profile.get('name', ''),
-                    "state": current_profile.get('state', ''),
-                    "craft": current_profile.get('craft_type', ''),
-                    "materials": current_profile.get('materials', ''),
-                    "years": current_profile.get('years_experience', ''),
-                    "channels": current_profile.get('sales_channels', ''),
-                    "style": current_profile.get('brand_style', ''),
-                    "languages": current_profile.get('languages', ''),
-                }).strip()
-
-                # Parse into Backstory and Tagline if possible
-                bs_match = re.search(r"Backstory:\s*(.+?)(?:\n\s*Tagline:|$)", raw_backstory, re.DOTALL | re.IGNORECASE)
-                tl_match = re.search(r"Tagline:\s*(.+)$", raw_backstory, re.DOTALL | re.IGNORECASE)
-                backstory_section = bs_match.group(1).strip() if bs_match else raw_backstory
-                tagline_section = tl_match.group(1).strip() if tl_match else ""
-
-                # Store backstory (including tagline at the end for convenience)
-                backstory_text = backstory_section + (f"\n\nTagline: {tagline_section}" if tagline_section else "")
-                services.store.save_backstory(user_id, backstory_text)
+                await asyncio.to_thread(services.store.save_backstory, user_id, backstory_text)
                 final_text = final_text + " I've also crafted your brand backstory. You can fetch it anytime."
             except Exception as e:
-                print(f"Backstory generation failed: {e}")
+                logger.exception("Saving backstory failed: %s", e)
                 backstory_text = None
 
         return {
             "is_onboarding": False,
             "user_profile_data": current_profile,
-            "messages": messages + [AIMessage(content=final_text)],
+            "messages": [AIMessage(content=final_text)],
             "final_response_text": final_text,
             "backstory": backstory_text
         }
@@ -412,76 +905,75 @@ Output exactly one sections in this format (no extra text):
     # Ask for the next missing piece of information
     next_field_to_ask = missing_fields[0]
     
-    # Field-specific prompts for artisans
-    field_prompts = {
-        "name": "What should I call your brand or what's your name?",
-        "state": "Which state/region in India are you based in?",
-        "craft_type": "What craft do you practice? (e.g., pottery, weaving, woodwork)",
-        "materials": "What materials do you mostly use? (e.g., clay, cotton, bamboo)",
-        "years_experience": "How many years have you been practicing this craft?",
-        "sales_channels": "Where do you usually sell? Online, offline, or both?",
-        "price_range": "What's your typical price range? (e.g., Rs 200-500, premium)",
-        "languages": "Which languages do you speak or want content in?",
-        "brand_style": "How would you describe your brand style or voice? (e.g., earthy, premium)"
-    }
-    
-    next_question = field_prompts.get(next_field_to_ask, f"Please provide your {next_field_to_ask}")
+    if len(missing_fields) >= 3:
+        # The extractor handles multiple fields per answer, so ask for three at once
+        a, b, c = (ONBOARDING_FIELD_LABELS[f] for f in missing_fields[:3])
+        next_question = f"Quick setup — tell me your {a}, {b}, and {c}."
+    else:
+        next_question = ONBOARDING_FIELD_PROMPTS[next_field_to_ask]
     
     return {
         "is_onboarding": True,
         "user_profile_data": current_profile,
-        "messages": messages + [AIMessage(content=next_question)],
+        "messages": [AIMessage(content=next_question)],
         "final_response_text": next_question
     }
 
-def supervisor_agent_node(state: AgentState) -> dict:
+@lru_cache(maxsize=10_000)
+def classify_intent(profile_json: str, query: str) -> str:
+    """Map a query to 'welfare_search' or 'general_query'; cached per (profile, query)."""
+    if _WELFARE_KEYWORDS_RE.search(query):
+        return "welfare_search"
+
+    intent = message_text(services.intent_chain.invoke({
+        "user_profile": profile_json, 
+        "query": query
+    })).strip().lower()
+    
+    # Map intent variations
+    if "welfare" in intent or "scheme" in intent or "benefit" in intent:
+        return "welfare_search"
+    return "general_query"
+
+async def supervisor_agent_node(state: AgentState) -> dict:
     """Smart intent classification for welfare scheme assistance."""
     user_id = state['user_id']
     
-    # Get user profile safely
+    # Get the serialized user profile safely
     try:
-        user_profile = services.store.get_user_profile(user_id) or {}
+        profile_json = await asyncio.to_thread(services.store.get_profile_prompt_json, user_id)
     except:
-        user_profile = {}
-    
-    prompt = ChatPromptTemplate.from_template("""
-Classify user intent for welfare scheme assistance:
-
-Intents:
-- 'welfare_search': Questions about government schemes, benefits, eligibility
-- 'general_query': Other questions
-
-User Profile: {user_profile}
-Query: {query}
-
-Respond with intent only.
-""")
+        profile_json = "{}"
     
-    chain = prompt | services.llm_gemini.bind_tools([{"google_search": {}}]) | StrOutputParser()
     query = state['messages'][-1].content
-    intent = chain.invoke({
-        "user_profile": json.dumps(sanitize_profile(user_profile)), 
-        "query": query
-    }).strip().lower()
-    
-    # Map intent variations
-    if "welfare" in intent or "scheme" in intent or "benefit" in intent:
-        final_intent = "welfare_search"
-    else:
-        final_intent = "general_query"
+    # classify_intent is lru_cached, so it stays synchronous and runs in a worker thread
+    final_intent = await asyncio.to_thread(classify_intent, profile_json, query)
         
     return {"intent": final_intent}
 
-def welfare_search_node(state: AgentState) -> dict:
+async def welfare_search_node(state: AgentState) -> dict:
     """Concise welfare scheme search with user profile matching."""
     query = state['messages'][-1].content
     user_id = state['user_id']
     
-    # Get user profile for targeted search
+    # Profile lookups and the query embedding are independent, so run them together
     try:
-        user_profile = services.store.get_user_profile(user_id) or {}
+        user_profile, profile_json, query_vec = await asyncio.gather(
+            asyncio.to_thread(services.store.get_user_profile, user_id),
+            asyncio.to_thread(services.store.get_profile_prompt_json, user_id),
+            embed_query_for_cache(query),
+        )
+        user_profile = user_profile or {}
     except:
-        user_profile = {}
+        user_profile, profile_json, query_vec = {}, "{}", None
+    
+    # Serve paraphrased repeats from the semantic cache
+    profile_hash = SemanticCache.profile_hash(profile_json)
+    if query_vec is not None:
+        cached = services.response_cache.lookup("welfare_search", profile_hash, query_vec)
+        if cached is not None:
+            logger.debug("Semantic cache hit for welfare_search")
+            return {"tool_output": cached}
     
     # Create targeted search query
     search_context = ""
@@ -490,85 +982,72 @@ def welfare_search_node(state: AgentState) -> dict:
         search_context = f"Indian welfare schemes for {sp.get('state', '')} {sp.get('income_category', '')} {sp.get('occupation', '')}"
     
     try:
-        search_results = services.web_search_tool.invoke({"query": f"{query} {search_context}"})
+        search_tool = services.web_search_tool
+        search_input = {"query": f"{query} {search_context}"}
+        if hasattr(search_tool, "ainvoke"):
+            search_results = await search_tool.ainvoke(search_input)
+        else:
+            search_results = await asyncio.to_thread(search_tool.invoke, search_input)
         
         # Create concise summary
-        summary_prompt = ChatPromptTemplate.from_template("""
-Provide a natural, conversational answer about welfare schemes based on search results.
-Sound like you're speaking to someone naturally, without emojis or bullet points.
-Keep response under 150 words and focus on practical information about eligibility and benefits.
-
-User Profile: {profile}
-Query: {query}
-Search Results: {results}
-
-Provide a helpful answer that sounds natural when spoken aloud.
-""")
-        
-        summary_chain = summary_prompt | services.llm_gemini.bind_tools([{"google_search": {}}]) | StrOutputParser()
-        concise_response = summary_chain.invoke({
-            "profile": json.dumps(sanitize_profile(user_profile)),
+        concise_response = message_text(await services.welfare_summary_chain.ainvoke({
+            "profile": profile_json,
             "query": query,
             "results": json.dumps(search_results[:3])  # Limit to top 3 results
-        })
+        }))
         
+        if query_vec is not None:
+            services.response_cache.store("welfare_search", profile_hash, query_vec, concise_response)
         return {"tool_output": concise_response}
     except Exception as e:
         return {"tool_output": f"Unable to search welfare schemes: {str(e)}"}
 
-def general_query_node(state: AgentState) -> dict:
+async def general_query_node(state: AgentState) -> dict:
     """Handles concise conversational queries about welfare schemes."""
     user_id = state['user_id']
     
-    # Get user profile safely
+    # Get the serialized user profile safely
     try:
-        user_profile = services.store.get_user_profile(user_id) or {}
+        profile_json = await asyncio.to_thread(services.store.get_profile_prompt_json, user_id)
     except:
-        user_profile = {}
+        profile_json = "{}"
     
-    prompt = ChatPromptTemplate.from_template("""
-Answer naturally and conversationally, as if speaking to someone in person.
-Remove all emojis, bullet points, and formatting. Keep response under 100 words.
-Sound natural and helpful when spoken aloud.
-
-User Profile: {user_profile}
-Question: {question}
-
-Provide a natural, spoken response focused on welfare schemes if relevant.
-""")
+    question = state['messages'][-1].content
     
-    chain = prompt | services.llm_gemini.bind_tools([{"google_search": {}}]) | StrOutputParser()
-    response = chain.invoke({
-        "user_profile": json.dumps(sanitize_profile(user_profile)),
-        "question": state['messages'][-1].content
-    })
+    # Serve paraphrased repeats from the semantic cache
+    profile_hash = SemanticCache.profile_hash(profile_json)
+    query_vec = await embed_query_for_cache(question)
+    if query_vec is not None:
+        cached = services.response_cache.lookup("general_query", profile_hash, query_vec)
+        if cached is not None:
+            logger.debug("Semantic cache hit for general_query")
+            return {"tool_output": cached}
+    
+    response = message_text(await services.general_query_chain.ainvoke({
+        "user_profile": profile_json,
+        "question": question
+    }))
     
+    if query_vec is not None:
+        services.response_cache.store("general_query", profile_hash, query_vec, response)
     return {"tool_output": response}
 
-def final_response_node(state: AgentState) -> dict:
-    """Creates natural, audio-friendly final responses."""
-    tool_output = state.get('tool_output', '')
-    
-    # For form generation, keep the response natural
-    if 'form' in tool_output.lower():
-        final_text = tool_output
-    else:
-        # For other responses, ensure they're concise and natural
-        prompt = ChatPromptTemplate.from_template("""
-Make this response sound natural and conversational, as if speaking to someone.
-Remove all emojis, bullet points, and technical formatting.
-Keep it under 150 words and make it sound like natural speech:
+# No node looks further back than the last few messages, so older ones are dropped at the
+# end of each turn; the whole list is re-serialized into every checkpoint
+MESSAGE_HISTORY_LIMIT = 10
 
-{tool_output}
+async def final_response_node(state: AgentState) -> dict:
+    """Turns the tool output into the final AI message.
 
-Make it friendly and helpful but natural for voice output.
-""")
-        
-        chain = prompt | services.llm_gemini.bind_tools([{"google_search": {}}]) | StrOutputParser()
-        final_text = chain.invoke({"tool_output": tool_output})
+    The welfare and general prompts already ask for natural, emoji-free speech under
+    150 words, so no second LLM pass is needed here.
+    """
+    final_text = state.get('tool_output') or ''
+    # The new reply is appended after the removals, so keep one slot free for it
+    stale = state.get('messages', [])[:-(MESSAGE_HISTORY_LIMIT - 1)]
     
     return {
-        "messages": [AIMessage(content=final_text)], 
+        "messages": [*(RemoveMessage(id=m.id) for m in stale if m.id), AIMessage(content=final_text)],
         "final_response_text": final_text
     }
 
@@ -633,17 +1112,222 @@ def build_agentic_workflow(services_instance):
 # 7. SQLITE PERSISTENCE LAYER
 # =======================
 
+# Hot statements are kept as fixed literals so each pooled connection's statement cache
+# prepares them once; reads return plain tuples, zipped against the column tuples below
+PROFILE_COLUMNS = (
+    "user_id", "name", "state", "age", "gender", "occupation", "income_category", "family_size",
+    "has_disability", "craft_type", "materials", "years_experience", "sales_channels", "price_range",
+    "languages", "brand_style", "backstory", "created_at", "updated_at",
+)
+HISTORY_COLUMNS = ("message_type", "content", "timestamp")
+MEDIA_COLUMNS = (
+    "id", "user_id", "description", "prompt_used", "model_used",
+    "original_image_path", "edited_image_path", "has_edited_image_blob", "created_at",
+)
+
+SQL_GET_PROFILE = f"SELECT {', '.join(PROFILE_COLUMNS)} FROM user_profiles WHERE user_id = ?"
+SQL_UPSERT_PROFILE = """
+    INSERT INTO user_profiles 
+    (user_id, name, state, age, gender, occupation, income_category, family_size, has_disability,
+     craft_type, materials, years_experience, sales_channels, price_range, languages, brand_style)
+    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+    ON CONFLICT(user_id) DO UPDATE SET
+        name = excluded.name, state = excluded.state,
+        age = excluded.age, gender = excluded.gender, occupation = excluded.occupation,
+        income_category = excluded.income_category, family_size = excluded.family_size,
+        has_disability = excluded.has_disability,
+        craft_type = excluded.craft_type, materials = excluded.materials,
+        years_experience = excluded.years_experience, sales_channels = excluded.sales_channels,
+        price_range = excluded.price_range, languages = excluded.languages,
+        brand_style = excluded.brand_style,
+        updated_at = CURRENT_TIMESTAMP
+"""
+SQL_INSERT_CONV = "INSERT INTO conversations (user_id, message_type, content) VALUES (?, ?, ?)"
+SQL_GET_HISTORY = f"""
+    SELECT {', '.join(HISTORY_COLUMNS)}
+    FROM conversations 
+    WHERE user_id = ? 
+    ORDER BY timestamp DESC 
+    LIMIT ?
+"""
+SQL_INSERT_MEDIA = """
+    INSERT INTO user_generated_media (
+        user_id, description, prompt_used, model_used,
+        original_image_path, edited_image_path, edited_image_blob
+    ) VALUES (?, ?, ?, ?, ?, ?, ?)
+"""
+
+# Media listings carry metadata only; the legacy inline blob is fetched on demand.
+# Select list order must match MEDIA_COLUMNS.
+SQL_GET_USER_MEDIA = """
+    SELECT id, user_id, description, prompt_used, model_used,
+           original_image_path, edited_image_path,
+           edited_image_blob IS NOT NULL AS has_edited_image_blob, created_at
+    FROM user_generated_media
+    WHERE user_id = ?
+    ORDER BY created_at DESC, id DESC
+    LIMIT ? OFFSET ?
+"""
+SQL_GET_MEDIA_BLOB = "SELECT edited_image_blob FROM user_generated_media WHERE id = ?"
+SQL_GET_MEDIA_IMAGE = """
+    SELECT edited_image_path, edited_image_blob IS NOT NULL
+    FROM user_generated_media
+    WHERE id = ? AND user_id = ?
+"""
+SQL_GET_DOUBLE_STORED_MEDIA = """
+    SELECT id, edited_image_path FROM user_generated_media
+    WHERE edited_image_blob IS NOT NULL AND edited_image_path IS NOT NULL
+"""
+SQL_DROP_MEDIA_BLOB = "UPDATE user_generated_media SET edited_image_blob = NULL WHERE id = ?"
+SQL_SET_MEDIA_DESCRIPTION = "UPDATE user_generated_media SET description = ? WHERE id = ?"
+SQL_SET_MEDIA_PATH = """
+    UPDATE user_generated_media SET edited_image_path = ?, edited_image_blob = NULL WHERE id = ?
+"""
+
+SQL_SET_BACKSTORY = "UPDATE user_profiles SET backstory = ?, updated_at = CURRENT_TIMESTAMP WHERE user_id = ?"
+SQL_DELETE_PROFILE = "DELETE FROM user_profiles WHERE user_id = ?"
+
+# Admin dump queries, paged by rowid; media reports the blob size instead of the blob itself
+_DB_DUMP_PAGE = " ORDER BY rowid LIMIT ? OFFSET ?"
+DB_DUMP_QUERIES = {
+    "user_profiles": "SELECT * FROM user_profiles" + _DB_DUMP_PAGE,
+    "conversations": "SELECT * FROM conversations" + _DB_DUMP_PAGE,
+    "welfare_schemes": "SELECT * FROM welfare_schemes" + _DB_DUMP_PAGE,
+    "user_generated_media": """
+        SELECT id, user_id, description, prompt_used, model_used,
+               original_image_path, edited_image_path,
+               length(edited_image_blob) AS edited_image_blob_size, created_at
+        FROM user_generated_media
+    """ + _DB_DUMP_PAGE,
+}
+
+# Checkpoint pruning: keep the newest checkpoint per thread, then drop orphaned writes
+SQL_PRUNE_CHECKPOINTS = """
+    DELETE FROM checkpoints
+    WHERE (thread_id, checkpoint_ns, checkpoint_id) NOT IN (
+        SELECT thread_id, checkpoint_ns, MAX(checkpoint_id)
+        FROM checkpoints
+        GROUP BY thread_id, checkpoint_ns
+    )
+"""
+# checkpoint_ids are time-ordered uuid6 strings, so "newest checkpoint older than the
+# cutoff" is a plain string comparison against a uuid6 built for the cutoff time
+SQL_EXPIRE_THREADS = """
+    DELETE FROM checkpoints
+    WHERE thread_id IN (
+        SELECT thread_id FROM checkpoints
+        GROUP BY thread_id
+        HAVING MAX(checkpoint_id) < ?
+    )
+"""
+SQL_PRUNE_WRITES = """
+    DELETE FROM writes
+    WHERE (thread_id, checkpoint_ns, checkpoint_id) NOT IN (
+        SELECT thread_id, checkpoint_ns, checkpoint_id FROM checkpoints
+    )
+"""
+
+# Bumped whenever PROFILE_COLUMN_MIGRATIONS changes; stored in PRAGMA user_version
+SCHEMA_VERSION = 2
+
+# (column, statement) pairs that bring older user_profiles tables up to date
+PROFILE_COLUMN_MIGRATIONS = (
+    ('state', "ALTER TABLE user_profiles ADD COLUMN state TEXT"),
+    ('craft_type', "ALTER TABLE user_profiles ADD COLUMN craft_type TEXT"),
+    ('materials', "ALTER TABLE user_profiles ADD COLUMN materials TEXT"),
+    ('years_experience', "ALTER TABLE user_profiles ADD COLUMN years_experience TEXT"),
+    ('sales_channels', "ALTER TABLE user_profiles ADD COLUMN sales_channels TEXT"),
+    ('price_range', "ALTER TABLE user_profiles ADD COLUMN price_range TEXT"),
+    ('languages', "ALTER TABLE user_profiles ADD COLUMN languages TEXT"),
+    ('brand_style', "ALTER TABLE user_profiles ADD COLUMN brand_style TEXT"),
+    ('backstory', "ALTER TABLE user_profiles ADD COLUMN backstory TEXT"),
+    ('gender', "ALTER TABLE user_profiles ADD COLUMN gender TEXT"),
+)
+
+# Conversation messages are written by a background thread, one transaction per batch
+# of up to CONVERSATION_BATCH_SIZE messages or CONVERSATION_FLUSH_SECONDS of arrivals
+CONVERSATION_BATCH_SIZE = 64
+CONVERSATION_FLUSH_SECONDS = 0.02
+
+# Per-connection prepared statement cache size (sqlite3 defaults to 128)
+SQLITE_STATEMENT_CACHE_SIZE = 256
+
+# Applied to every connection before use. WAL + synchronous=NORMAL drops the fsync on
+# each commit to a checkpoint-time fsync and lets readers run alongside a writer.
+SQLITE_CONNECTION_PRAGMAS = (
+    "PRAGMA journal_mode=WAL",
+    "PRAGMA synchronous=NORMAL",
+    "PRAGMA temp_store=MEMORY",
+    "PRAGMA mmap_size=268435456",
+    "PRAGMA cache_size=-65536",
+)
+
 class SQLiteStore:
     """SQLite-based persistent storage for user profiles and conversations."""
     
-    def __init__(self, db_path: str = "agent_data.db"):
+    def __init__(self, db_path: str = "agent_data.db", pool_size: int = 8):
         self.db_path = db_path
+        # Connections are opened lazily up to pool_size and reused across requests
+        self._pool: "queue.Queue[sqlite3.Connection]" = queue.Queue(maxsize=pool_size)
+        self._pool_size = pool_size
+        self._pool_created = 0
+        self._pool_lock = threading.Lock()
+        self._write_queue: "queue.Queue[tuple]" = queue.Queue()
+        self._writer: Optional[threading.Thread] = None
+        self._writer_lock = threading.Lock()
+        # SQL literal -> result column names, filled on first execute of dynamic queries
+        self._columns_cache: Dict[str, tuple] = {}
         self._init_database()
+
+    def _new_connection(self) -> sqlite3.Connection:
+        """Open a connection tuned for concurrent access from worker threads."""
+        conn = sqlite3.connect(
+            self.db_path,
+            check_same_thread=False,
+            cached_statements=SQLITE_STATEMENT_CACHE_SIZE,
+        )
+        for pragma in SQLITE_CONNECTION_PRAGMAS:
+            conn.execute(pragma)
+        return conn
+
+    @contextmanager
+    def _conn(self):
+        """Borrow a pooled connection; rolls back on error and always returns it."""
+        try:
+            conn = self._pool.get_nowait()
+        except queue.Empty:
+            with self._pool_lock:
+                can_open = self._pool_created < self._pool_size
+                if can_open:
+                    self._pool_created += 1
+            if can_open:
+                try:
+                    conn = self._new_connection()
+                except Exception:
+                    with self._pool_lock:
+                        self._pool_created -= 1
+                    raise
+            else:
+                conn = self._pool.get()
+        try:
+            yield conn
+        except BaseException:
+            conn.rollback()
+            raise
+        finally:
+            self._pool.put(conn)
     
     def _init_database(self):
         """Initialize the SQLite database with required tables."""
-        with sqlite3.connect(self.db_path) as conn:
+        # Pooled connections already carry SQLITE_CONNECTION_PRAGMAS, so the
+        # DDL below runs in WAL mode with the tuned cache settings
+        with self._conn() as conn:
             cursor = conn.cursor()
+            # sqlite3 autocommits DDL; wrap the whole schema setup in one transaction
+            # so a cold start costs a single commit instead of one per statement. IMMEDIATE
+            # takes the write lock up front: every worker runs this at boot, and a deferred
+            # read-then-write upgrade fails with SQLITE_BUSY without waiting on busy_timeout
+            cursor.execute("BEGIN IMMEDIATE")
             
             # User profiles table
             cursor.execute("""
@@ -672,28 +1356,20 @@ class SQLiteStore:
                 )
             """)
             
-            # Migrate existing DBs: add artisan columns if missing
-            cursor.execute("PRAGMA table_info(user_profiles)")
-            columns = [column[1] for column in cursor.fetchall()]
-            migrations = {
-                'state': "ALTER TABLE user_profiles ADD COLUMN state TEXT",
-                'craft_type': "ALTER TABLE user_profiles ADD COLUMN craft_type TEXT",
-                'materials': "ALTER TABLE user_profiles ADD COLUMN materials TEXT",
-                'years_experience': "ALTER TABLE user_profiles ADD COLUMN years_experience TEXT",
-                'sales_channels': "ALTER TABLE user_profiles ADD COLUMN sales_channels TEXT",
-                'price_range': "ALTER TABLE user_profiles ADD COLUMN price_range TEXT",
-                'languages': "ALTER TABLE user_profiles ADD COLUMN languages TEXT",
-                'brand_style': "ALTER TABLE user_profiles ADD COLUMN brand_style TEXT",
-                'backstory': "ALTER TABLE user_profiles ADD COLUMN backstory TEXT",
-                'gender': "ALTER TABLE user_profiles ADD COLUMN gender TEXT"
-            }
-            for col, stmt in migrations.items():
-                if col not in columns:
-                    try:
-                        cursor.execute(stmt)
-                        print(f"Added {col} column to existing user_profiles table")
-                    except Exception as e:
-                        print(f"Column migration for {col} skipped/failed: {e}")
+            # Migrate existing DBs: add artisan columns if missing. Already-migrated
+            # databases carry SCHEMA_VERSION and skip the table_info scan entirely.
+            cursor.execute("PRAGMA user_version")
+            if cursor.fetchone()[0] < SCHEMA_VERSION:
+                cursor.execute("PRAGMA table_info(user_profiles)")
+                columns = {column[1] for column in cursor.fetchall()}
+                for col, stmt in PROFILE_COLUMN_MIGRATIONS:
+                    if col not in columns:
+                        try:
+                            cursor.execute(stmt)
+                            print(f"Added {col} column to existing user_profiles table")
+                        except Exception as e:
+                            print(f"Column migration for {col} skipped/failed: {e}")
+                cursor.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
             
             # Conversation history table
             cursor.execute("""
@@ -736,125 +1412,143 @@ class SQLiteStore:
                     FOREIGN KEY (user_id) REFERENCES user_profiles (user_id)
                 )
             """)
+
+            # Deleting a profile removes its conversation history as part of the same
+            # statement (an ON DELETE CASCADE without turning on FK enforcement, which
+            # would reject media saved for users who have no profile row)
+            cursor.execute("""
+                CREATE TRIGGER IF NOT EXISTS trg_profile_delete_conversations
+                AFTER DELETE ON user_profiles
+                BEGIN
+                    DELETE FROM conversations WHERE user_id = OLD.user_id;
+                END
+            """)
+
+            # History and media reads filter by user and sort newest-first
+            cursor.execute("""
+                CREATE INDEX IF NOT EXISTS idx_conv_user_ts
+                ON conversations (user_id, timestamp DESC)
+            """)
+            cursor.execute("""
+                CREATE INDEX IF NOT EXISTS idx_media_user_created
+                ON user_generated_media (user_id, created_at DESC)
+            """)
+
+            # Gather planner statistics once; later boots keep the existing ones
+            cursor.execute("SELECT name FROM sqlite_master WHERE name = 'sqlite_stat1'")
+            if cursor.fetchone() is None:
+                cursor.execute("ANALYZE")
             
             conn.commit()
     
     def get_user_profile(self, user_id: str) -> Optional[Dict]:
-        """Retrieve user profile from database."""
-        with sqlite3.connect(self.db_path) as conn:
+        """Retrieve user profile from database.
+
+        Every column is TEXT and unset ones are left out, so the dict is already the
+        Dict[str, str] that API responses need.
+        """
+        with self._conn() as conn:
             cursor = conn.cursor()
-            cursor.execute("SELECT * FROM user_profiles WHERE user_id = ?", (user_id,))
+            cursor.execute(SQL_GET_PROFILE, (user_id,))
             row = cursor.fetchone()
-            
-            if row:
-                columns = [desc[0] for desc in cursor.description]
-                return dict(zip(columns, row))
-            return None
+            if not row:
+                return None
+            return {k: v for k, v in zip(PROFILE_COLUMNS, row) if v is not None}
+
+    def get_profile_prompt_json(self, user_id: str) -> str:
+        """Return the sanitized profile as canonical JSON for use in prompts."""
+        return json.dumps(sanitize_profile(self.get_user_profile(user_id)), sort_keys=True)
     
     def save_user_profile(self, user_id: str, profile_data: Dict) -> None:
         """Save or update user profile in database."""
-        with sqlite3.connect(self.db_path) as conn:
+        with self._conn() as conn:
             cursor = conn.cursor()
-            
-            # Check if profile exists
-            existing = self.get_user_profile(user_id)
-            
-            if existing:
-                # Update existing profile
-                cursor.execute("""
-                    UPDATE user_profiles 
-                    SET name = ?, state = ?,
-                        age = ?, gender = ?, occupation = ?, income_category = ?, family_size = ?, has_disability = ?,
-                        craft_type = ?, materials = ?, years_experience = ?, sales_channels = ?, price_range = ?, languages = ?, brand_style = ?,
-                        updated_at = CURRENT_TIMESTAMP
-                    WHERE user_id = ?
-                """, (
-                    profile_data.get('name'),
-                    profile_data.get('state'),
-                    profile_data.get('age'),
-                    profile_data.get('gender'),
-                    profile_data.get('occupation'),
-                    profile_data.get('income_category'),
-                    profile_data.get('family_size'),
-                    profile_data.get('has_disability'),
-                    profile_data.get('craft_type'),
-                    profile_data.get('materials'),
-                    profile_data.get('years_experience'),
-                    profile_data.get('sales_channels'),
-                    profile_data.get('price_range'),
-                    profile_data.get('languages'),
-                    profile_data.get('brand_style'),
-                    user_id
-                ))
-            else:
-                # Insert new profile
-                cursor.execute("""
-                    INSERT INTO user_profiles 
-                    (user_id, name, state, age, gender, occupation, income_category, family_size, has_disability,
-                     craft_type, materials, years_experience, sales_channels, price_range, languages, brand_style)
-                    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-                """, (
-                    user_id,
-                    profile_data.get('name'),
-                    profile_data.get('state'),
-                    profile_data.get('age'),
-                    profile_data.get('gender'),
-                    profile_data.get('occupation'),
-                    profile_data.get('income_category'),
-                    profile_data.get('family_size'),
-                    profile_data.get('has_disability'),
-                    profile_data.get('craft_type'),
-                    profile_data.get('materials'),
-                    profile_data.get('years_experience'),
-                    profile_data.get('sales_channels'),
-                    profile_data.get('price_range'),
-                    profile_data.get('languages'),
-                    profile_data.get('brand_style')
-                ))
-            
+            # Single UPSERT: no existence check, one statement per save
+            cursor.execute(SQL_UPSERT_PROFILE, (
+                user_id,
+                profile_data.get('name'),
+                profile_data.get('state'),
+                profile_data.get('age'),
+                profile_data.get('gender'),
+                profile_data.get('occupation'),
+                profile_data.get('income_category'),
+                profile_data.get('family_size'),
+                profile_data.get('has_disability'),
+                profile_data.get('craft_type'),
+                profile_data.get('materials'),
+                profile_data.get('years_experience'),
+                profile_data.get('sales_channels'),
+                profile_data.get('price_range'),
+                profile_data.get('languages'),
+                profile_data.get('brand_style')
+            ))
             conn.commit()
 
     def save_backstory(self, user_id: str, backstory_text: str) -> None:
-        with sqlite3.connect(self.db_path) as conn:
+        with self._conn() as conn:
             cursor = conn.cursor()
-            cursor.execute("""
-                UPDATE user_profiles SET backstory = ?, updated_at = CURRENT_TIMESTAMP WHERE user_id = ?
-            """, (backstory_text, user_id))
+            cursor.execute(SQL_SET_BACKSTORY, (backstory_text, user_id))
             conn.commit()
     
     def delete_user_profile(self, user_id: str) -> None:
         """Delete user profile from database."""
-        with sqlite3.connect(self.db_path) as conn:
+        self.flush()
+        with self._conn() as conn:
             cursor = conn.cursor()
-            cursor.execute("DELETE FROM user_profiles WHERE user_id = ?", (user_id,))
-            cursor.execute("DELETE FROM conversations WHERE user_id = ?", (user_id,))
+            # Conversations go with it via trg_profile_delete_conversations
+            cursor.execute(SQL_DELETE_PROFILE, (user_id,))
             conn.commit()
     
-    def save_conversation_message(self, user_id: str, message_type: str, content: str) -> None:
-        """Save conversation message to database."""
-        with sqlite3.connect(self.db_path) as conn:
-            cursor = conn.cursor()
-            cursor.execute("""
-                INSERT INTO conversations (user_id, message_type, content)
-                VALUES (?, ?, ?)
-            """, (user_id, message_type, content))
+    def save_conversation_messages(self, rows: Iterable[tuple]) -> None:
+        """Insert (user_id, message_type, content) rows in a single transaction."""
+        with self._conn() as conn:
+            conn.executemany(SQL_INSERT_CONV, rows)
             conn.commit()
+
+    def save_conversation_message(self, user_id: str, message_type: str, content: str) -> None:
+        """Queue a conversation message for the background writer; never blocks on SQLite."""
+        if self._writer is None:
+            with self._writer_lock:
+                if self._writer is None:
+                    self._writer = threading.Thread(
+                        target=self._write_conversations, name="conversation-writer", daemon=True
+                    )
+                    self._writer.start()
+        self._write_queue.put_nowait((user_id, message_type, content))
+
+    def _write_conversations(self) -> None:
+        """Drain the write queue forever, committing each batch in one transaction."""
+        while True:
+            batch = [self._write_queue.get()]
+            deadline = time.monotonic() + CONVERSATION_FLUSH_SECONDS
+            while len(batch) < CONVERSATION_BATCH_SIZE:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(self._write_queue.get(timeout=remaining))
+                except queue.Empty:
+                    break
+            try:
+                self.save_conversation_messages(batch)
+            except Exception as e:
+                logger.exception("Failed to write %d conversation messages: %s", len(batch), e)
+            finally:
+                for _ in batch:
+                    self._write_queue.task_done()
+
+    def flush(self) -> None:
+        """Block until every queued conversation message has been written."""
+        self._write_queue.join()
     
     def get_conversation_history(self, user_id: str, limit: int = 10) -> List[Dict]:
         """Get recent conversation history for a user."""
-        with sqlite3.connect(self.db_path) as conn:
+        # Read-your-writes: pending messages must be visible to the query below
+        self.flush()
+        with self._conn() as conn:
             cursor = conn.cursor()
-            cursor.execute("""
-                SELECT message_type, content, timestamp 
-                FROM conversations 
-                WHERE user_id = ? 
-                ORDER BY timestamp DESC 
-                LIMIT ?
-            """, (user_id, limit))
-            
-            rows = cursor.fetchall()
-            columns = [desc[0] for desc in cursor.description]
-            return [dict(zip(columns, row)) for row in rows]
+            cursor.execute(SQL_GET_HISTORY, (user_id, limit))
+            return [dict(zip(HISTORY_COLUMNS, row)) for row in cursor.fetchall()]
 
     def save_generated_media(
         self,
@@ -867,15 +1561,10 @@ class SQLiteStore:
         edited_image_blob: Optional[bytes],
     ) -> int:
         """Persist a generated media record and return its ID."""
-        with sqlite3.connect(self.db_path) as conn:
+        with self._conn() as conn:
             cursor = conn.cursor()
             cursor.execute(
-                """
-                INSERT INTO user_generated_media (
-                    user_id, description, prompt_used, model_used,
-                    original_image_path, edited_image_path, edited_image_blob
-                ) VALUES (?, ?, ?, ?, ?, ?, ?)
-                """,
+                SQL_INSERT_MEDIA,
                 (
                     user_id,
                     description,
@@ -889,290 +1578,455 @@ class SQLiteStore:
             conn.commit()
             return cursor.lastrowid
 
-    def get_user_media(self, user_id: str) -> List[Dict]:
-        with sqlite3.connect(self.db_path) as conn:
-            cursor = conn.cursor()
-            cursor.execute(
-                """
-                SELECT id, user_id, description, prompt_used, model_used,
-                       original_image_path, edited_image_path, edited_image_blob, created_at
-                FROM user_generated_media
-                WHERE user_id = ?
-                ORDER BY created_at DESC
-                """,
-                (user_id,),
-            )
-            rows = cursor.fetchall()
-            columns = [desc[0] for desc in cursor.description]
-            return [dict(zip(columns, row)) for row in rows]
-
-    def get_all_db_entries(self) -> Dict[str, List[Dict]]:
-        """Return a dump of all main tables."""
-        with sqlite3.connect(self.db_path) as conn:
-            conn.row_factory = sqlite3.Row
-            cursor = conn.cursor()
-            result: Dict[str, List[Dict]] = {}
-            for table in [
-                "user_profiles",
-                "conversations",
-                "welfare_schemes",
-                "user_generated_media",
-            ]:
-                try:
-                    cursor.execute(f"SELECT * FROM {table}")
-                    rows = cursor.fetchall()
-                    result[table] = [dict(row) for row in rows]
-                except Exception as e:
-                    result[table] = [{"error": f"Failed to fetch: {e}"}]
-            return result
+    def get_user_media(self, user_id: str, limit: int = -1, offset: int = 0) -> List[Dict]:
+        """Metadata of a user's media, newest first; blob contents are never read."""
+        with self._conn() as conn:
+            cursor = conn.cursor()
+            cursor.execute(SQL_GET_USER_MEDIA, (user_id, limit, offset))
+            return [dict(zip(MEDIA_COLUMNS, row)) for row in cursor.fetchall()]
+
+    def get_media_image(self, user_id: str, media_id: int) -> Optional[tuple]:
+        """(edited_image_path, has_edited_image_blob) of one of the user's media records."""
+        with self._conn() as conn:
+            row = conn.execute(SQL_GET_MEDIA_IMAGE, (media_id, user_id)).fetchone()
+            return (row[0], bool(row[1])) if row else None
+
+    def update_media_description(self, media_id: int, description: Optional[str]) -> None:
+        with self._conn() as conn:
+            conn.execute(SQL_SET_MEDIA_DESCRIPTION, (description, media_id))
+            conn.commit()
+
+    def get_media_blob(self, media_id: int) -> Optional[bytes]:
+        """Fetch only the inline image blob of a media record."""
+        with self._conn() as conn:
+            row = conn.execute(SQL_GET_MEDIA_BLOB, (media_id,)).fetchone()
+            return row[0] if row else None
+
+    def move_media_blob_to_file(self, media_id: int, directory: str) -> Optional[str]:
+        """Write a legacy inline blob to disk, repoint the record at it and drop the blob."""
+        blob = self.get_media_blob(media_id)
+        if not blob:
+            return None
+        os.makedirs(directory, exist_ok=True)
+        path = os.path.join(directory, f"edited_media_{media_id}.png")
+        with open(path, "wb") as f:
+            f.write(blob)
+        with self._conn() as conn:
+            conn.execute(SQL_SET_MEDIA_PATH, (path, media_id))
+            conn.commit()
+        return path
+
+    def ping(self) -> None:
+        """Round-trip a trivial query through the pool (health checks)."""
+        with self._conn() as conn:
+            conn.execute("SELECT 1").fetchone()
+
+    def drop_redundant_media_blobs(self) -> int:
+        """Null the inline blob of records whose image file exists on disk; returns the count.
+
+        New records keep a blob only when the file write failed, but older rows stored
+        every image twice.
+        """
+        with self._conn() as conn:
+            rows = conn.execute(SQL_GET_DOUBLE_STORED_MEDIA).fetchall()
+            ids = [(media_id,) for media_id, path in rows if os.path.isfile(path)]
+            if ids:
+                conn.executemany(SQL_DROP_MEDIA_BLOB, ids)
+                conn.commit()
+            return len(ids)
+
+    def _columns(self, sql: str, cursor: sqlite3.Cursor) -> tuple:
+        """Column names for an executed statement, read from cursor.description only once."""
+        columns = self._columns_cache.get(sql)
+        if columns is None:
+            columns = self._columns_cache[sql] = tuple(desc[0] for desc in cursor.description)
+        return columns
+
+    def iter_db_entries(self, limit: int = 1000, offset: int = 0, page_size: int = 200):
+        """Yield (table, rows) pages of at most page_size rows from each main table."""
+        with self._conn() as conn:
+            for table, query in DB_DUMP_QUERIES.items():
+                cursor = conn.cursor()
+                cursor.arraysize = page_size
+                try:
+                    cursor.execute(query, (limit, offset))
+                    columns = self._columns(query, cursor)
+                    while True:
+                        rows = cursor.fetchmany()
+                        if not rows:
+                            break
+                        yield table, [dict(zip(columns, row)) for row in rows]
+                except Exception as e:
+                    yield table, [{"error": f"Failed to fetch: {e}"}]
+
+    def get_all_db_entries(self, limit: int = 1000, offset: int = 0) -> Dict[str, List[Dict]]:
+        """Return one page (limit/offset per table) of all main tables."""
+        result: Dict[str, List[Dict]] = {table: [] for table in DB_DUMP_QUERIES}
+        for table, rows in self.iter_db_entries(limit=limit, offset=offset):
+            result[table].extend(rows)
+        return result
+
+    def iter_db_entries_ndjson(self, limit: int = 1000, offset: int = 0):
+        """Yield the admin dump as NDJSON bytes, one {"table", "row"} object per line.
+
+        Each page is encoded by orjson and joined in a single pass, so no per-table
+        list of dicts is ever held for the whole dump.
+        """
+        for table, rows in self.iter_db_entries(limit=limit, offset=offset):
+            yield b"".join(
+                orjson.dumps({"table": table, "row": row}, option=orjson.OPT_APPEND_NEWLINE)
+                for row in rows
+            )
+
+class CachedProfileStore(SQLiteStore):
+    """SQLiteStore with a per-user LRU/TTL cache in front of get_user_profile.
+
+    A single turn reads the same profile from several nodes; the cache collapses those
+    into one SQLite hit. The sanitized prompt JSON is memoized the same way. Writes to a
+    profile invalidate both entries.
+
+    Only existing profiles are cached. Onboarding may finish on another worker, whose
+    save cannot invalidate this worker's cache, so a cached "no profile" would send the
+    user back into onboarding until it expired.
+    """
+
+    _MISSING = object()
+
+    def __init__(self, db_path: str = "agent_data.db", maxsize: int = 10_000, ttl: float = 60):
+        super().__init__(db_path)
+        self._profile_cache = TTLCache(maxsize=maxsize, ttl=ttl)
+        self._prompt_json_cache = TTLCache(maxsize=maxsize, ttl=ttl)
+        self._cache_lock = threading.RLock()
+        # Per-user load locks coalesce concurrent misses into a single SQLite read
+        self._load_locks: Dict[str, threading.Lock] = {}
+
+    def _invalidate(self, user_id: str) -> None:
+        with self._cache_lock:
+            self._profile_cache.pop(user_id, None)
+            self._prompt_json_cache.pop(user_id, None)
+
+    def get_user_profile(self, user_id: str) -> Optional[Dict]:
+        with self._cache_lock:
+            cached = self._profile_cache.get(user_id, self._MISSING)
+            if cached is self._MISSING:
+                load_lock = self._load_locks.setdefault(user_id, threading.Lock())
+        if cached is self._MISSING:
+            with load_lock:
+                # A concurrent caller may have loaded it while we waited
+                with self._cache_lock:
+                    cached = self._profile_cache.get(user_id, self._MISSING)
+                if cached is self._MISSING:
+                    try:
+                        cached = super().get_user_profile(user_id)
+                        if cached is not None:
+                            with self._cache_lock:
+                                self._profile_cache[user_id] = cached
+                    finally:
+                        # Also on a failed read, or the lock would stay behind for good
+                        with self._cache_lock:
+                            self._load_locks.pop(user_id, None)
+        # Hand out copies so callers cannot mutate the cached entry
+        return dict(cached) if cached is not None else None
+
+    def get_profile_prompt_json(self, user_id: str) -> str:
+        with self._cache_lock:
+            cached = self._prompt_json_cache.get(user_id)
+        if cached is None:
+            profile = self.get_user_profile(user_id)
+            cached = json.dumps(sanitize_profile(profile), sort_keys=True)
+            if profile is not None:
+                with self._cache_lock:
+                    self._prompt_json_cache[user_id] = cached
+        return cached
+
+    def save_user_profile(self, user_id: str, profile_data: Dict) -> None:
+        super().save_user_profile(user_id, profile_data)
+        self._invalidate(user_id)
+
+    def save_backstory(self, user_id: str, backstory_text: str) -> None:
+        super().save_backstory(user_id, backstory_text)
+        self._invalidate(user_id)
+
+    def delete_user_profile(self, user_id: str) -> None:
+        super().delete_user_profile(user_id)
+        self._invalidate(user_id)
 
 # =======================
 # 8. GLOBAL SERVICES INITIALIZATION
 # =======================
 
+class _lazy_service(cached_property):
+    """cached_property that builds its value at most once, even under concurrent first access."""
+
+    _lock = threading.RLock()
+
+    def __get__(self, instance, owner=None):
+        if instance is None:
+            return self
+        # After the first build the value sits in the instance __dict__ and this is bypassed
+        with self._lock:
+            return super().__get__(instance, owner)
+
+
 class AgentServices:
-    """Centralized service management for the agent workflow."""
+    """Centralized service management for the agent workflow.
+
+    Model clients, the store and the compiled workflow are built on first use, so
+    importing the module and forking workers stays cheap.
+    """
     
     def __init__(self):
-        
-        self.llm_gemini = ChatVertexAI(
+        self.response_cache = SemanticCache()
+        self.description_cache = TTLCache(maxsize=DESCRIPTION_CACHE_SIZE, ttl=DESCRIPTION_CACHE_TTL_SECONDS)
+        self._vertex_clients: Dict[tuple, Any] = {}
+        self._vertex_clients_lock = threading.Lock()
+
+    @_lazy_service
+    def llm_gemini(self):
+        return ChatVertexAI(
             model="gemini-2.5-flash", 
             temperature=0.8,
             thinking_budget=0,
 
         )
-        # google-genai client for image generation (prefer Vertex AI per project/location)
-        self.genai_client = None
+
+    @_lazy_service
+    def genai_client(self):
+        """google-genai client for image generation (prefer Vertex AI per project/location)."""
         try:
-            project = (
-                os.environ.get("GOOGLE_CLOUD_PROJECT")
-                or os.environ.get("PROJECT_ID")
-            )
-            location = (
-                os.environ.get("GOOGLE_CLOUD_REGION")
-                or os.environ.get("LOCATION")
-                or "us-central1"
-            )
+            project = IMAGE_GEN_CONFIG.project
+            location = IMAGE_GEN_CONFIG.region
             if project:
-                self.genai_client = genai.Client(vertexai=True, project=project, location=location)
+                client = genai.Client(vertexai=True, project=project, location=location)
                 print(f"Initialized google-genai Vertex client (project={project}, location={location})")
-            else:
-                api_key = os.environ.get("GOOGLE_API_KEY") or os.environ.get("KEY") or os.environ.get("GOOGLE_CLOUD_API_KEY")
-                if api_key:
-                    self.genai_client = genai.Client(api_key=api_key)
-                    print("Initialized google-genai client with API key (Google AI API)")
-                else:
-                    print("No PROJECT/LOCATION or GOOGLE_API_KEY found; image generation disabled")
+                return client
+            api_key = os.environ.get("GOOGLE_API_KEY") or os.environ.get("KEY") or os.environ.get("GOOGLE_CLOUD_API_KEY")
+            if api_key:
+                client = genai.Client(api_key=api_key)
+                print("Initialized google-genai client with API key (Google AI API)")
+                return client
+            print("No PROJECT/LOCATION or GOOGLE_API_KEY found; image generation disabled")
         except Exception as e:
             print(f"Failed to initialize google-genai client: {e}")
+        return None
+
+    def vertex_client(self, project: str, location: str):
+        """Vertex google-genai client for another location, built once and then reused."""
+        key = (project, location)
+        with self._vertex_clients_lock:
+            client = self._vertex_clients.get(key)
+            if client is None:
+                client = self._vertex_clients[key] = genai.Client(vertexai=True, project=project, location=location)
+            return client
+
+    @_lazy_service
+    def embedder(self):
+        """Embeddings back the semantic response cache; the cache is skipped if unavailable."""
+        try:
+            return VertexAIEmbeddings(
+                model_name=os.environ.get("EMBEDDING_MODEL", "text-embedding-005")
+            )
+        except Exception as e:
+            logger.error("Failed to initialize embeddings; semantic cache disabled: %s", e)
+            return None
 
-        self.checkpointer = InMemorySaver()
-        self.store = SQLiteStore()  # Use SQLite instead of InMemoryStore
-        self.workflow = None
-        self._initialize_workflow()
-    
-    def _initialize_workflow(self):
-        """Initialize the LangGraph workflow."""
-        self.workflow = build_agentic_workflow(self)
+    @_lazy_service
+    def checkpointer(self):
+        # The saver opens the aiosqlite connection lazily, inside the running event loop
+        return AsyncSqliteSaver(aiosqlite.connect(CHECKPOINT_DB_PATH))
+
+    @_lazy_service
+    def store(self):
+        # SQLite with a short-lived profile cache in front
+        return CachedProfileStore(maxsize=PROFILE_CACHE_SIZE, ttl=PROFILE_CACHE_TTL_SECONDS)
+
+    # Prompt | model pipelines, built once on first use; nodes and endpoints share them
+    @_lazy_service
+    def _llm_with_search(self):
+        return self.llm_gemini.bind_tools([{"google_search": {}}])
+
+    @_lazy_service
+    def extraction_chain(self):
+        # JSON mode with a response schema: output is guaranteed parseable, no regex cleanup needed
+        return _EXTRACTION_PROMPT | self.llm_gemini.with_structured_output(ExtractedProfile, method="json_mode")
+
+    @_lazy_service
+    def backstory_chain(self):
+        return _BACKSTORY_PROMPT | self._llm_with_search
+
+    @_lazy_service
+    def intent_chain(self):
+        return _INTENT_PROMPT | self._llm_with_search
+
+    @_lazy_service
+    def welfare_summary_chain(self):
+        return _WELFARE_SUMMARY_PROMPT | self._llm_with_search
+
+    @_lazy_service
+    def general_query_chain(self):
+        return _GENERAL_QUERY_PROMPT | self._llm_with_search
+
+    @_lazy_service
+    def image_description_chain(self):
+        return _IMAGE_DESCRIPTION_PROMPT | self._llm_with_search
+
+    @_lazy_service
+    def fallback_description_chain(self):
+        return _FALLBACK_DESCRIPTION_PROMPT | self._llm_with_search
+
+    @_lazy_service
+    def workflow(self):
+        """The compiled LangGraph workflow, built on the first invocation."""
+        return build_agentic_workflow(self)
 
 # Global services instance
 services = AgentServices()
 
+def checkpoint_id_floor(unix_seconds: float) -> str:
+    """The smallest LangGraph checkpoint_id (uuid6) that could be issued at unix_seconds."""
+    timestamp = int(unix_seconds * 10_000_000) + 0x01B21DD213814000  # 100ns since 1582
+    uuid_int = ((timestamp >> 12) & 0xFFFFFFFFFFFF) << 80 | (timestamp & 0x0FFF) << 64
+    uuid_int |= 0x6 << 76 | 0x2 << 62  # version 6, RFC 4122 variant (UUID() rejects version=6)
+    return str(UUID(int=uuid_int))
+
+def prune_checkpoint_history(db_path: str) -> None:
+    """Delete threads idle for CHECKPOINT_THREAD_TTL_DAYS, then keep only the latest
+    checkpoint per remaining thread; older ones are never read back."""
+    cutoff = checkpoint_id_floor(time.time() - CHECKPOINT_THREAD_TTL_DAYS * 86400)
+    with sqlite3.connect(db_path) as conn:
+        try:
+            conn.execute(SQL_EXPIRE_THREADS, (cutoff,))
+            conn.execute(SQL_PRUNE_CHECKPOINTS)
+            conn.execute(SQL_PRUNE_WRITES)
+            conn.commit()
+        except sqlite3.OperationalError as e:
+            # Tables are created by the saver on first use
+            logger.warning("Checkpoint pruning skipped: %s", e)
+
+_checkpoint_prune_task = None
+_checkpoint_prune_lock = None
+
+def _hold_checkpoint_prune_lock() -> bool:
+    """True if this worker is the one that prunes.
+
+    The pruner is whichever worker holds an exclusive flock on a file next to the
+    checkpoint DB. The OS releases it when that process exits, and another worker
+    picks it up on its next tick.
+    """
+    global _checkpoint_prune_lock
+    if _checkpoint_prune_lock is None:
+        lock_file = open(f"{CHECKPOINT_DB_PATH}.prune.lock", "a")
+        try:
+            fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            lock_file.close()
+            return False
+        _checkpoint_prune_lock = lock_file
+    return True
+
+async def _prune_checkpoints_periodically():
+    while True:
+        await asyncio.sleep(CHECKPOINT_PRUNE_INTERVAL_SECONDS)
+        try:
+            if _hold_checkpoint_prune_lock():
+                await asyncio.to_thread(prune_checkpoint_history, CHECKPOINT_DB_PATH)
+        except Exception:
+            logger.exception("Checkpoint pruning failed")
+
+@app.on_event("startup")
+async def _tune_checkpointer():
+    """Open the checkpoint DB with the same PRAGMAs as the store's pooled connections."""
+    try:
+        await services.checkpointer.setup()
+        for pragma in SQLITE_CONNECTION_PRAGMAS:
+            await services.checkpointer.conn.execute(pragma)
+    except Exception as e:
+        logger.warning("Checkpointer tuning skipped: %s", e)
+
+# Services read by request handlers; built per worker at startup so the first request
+# does not pay for model client setup and tool binding, and credential discovery never
+# runs on the event loop (the clients are built under _lazy_service's shared lock)
+WARM_SERVICES = (
+    "extraction_chain", "backstory_chain", "intent_chain", "welfare_summary_chain",
+    "general_query_chain", "image_description_chain", "fallback_description_chain",
+    "genai_client", "embedder",
+)
+
+@app.on_event("startup")
+async def _warm_services():
+    try:
+        # Client construction may look up credentials over the network, so off the loop
+        await asyncio.to_thread(lambda: [getattr(services, name) for name in WARM_SERVICES])
+        # The saver was bound to this loop by _tune_checkpointer; compiling is cheap
+        services.workflow
+    except Exception as e:
+        logger.warning("Service warm-up skipped: %s", e)
+
+@app.on_event("startup")
+async def _start_checkpoint_pruning():
+    global _checkpoint_prune_task
+    _checkpoint_prune_task = asyncio.create_task(_prune_checkpoints_periodically())
+
+@app.on_event("startup")
+async def _ensure_media_dirs():
+    os.makedirs(UPLOADS_DIR, exist_ok=True)
+    os.makedirs(EDITED_DIR, exist_ok=True)
+
+@app.on_event("startup")
+async def _drop_redundant_media_blobs():
+    try:
+        dropped = await asyncio.to_thread(services.store.drop_redundant_media_blobs)
+        if dropped:
+            logger.info("Dropped %d media blobs already stored as files", dropped)
+    except Exception as e:
+        logger.warning("Media blob cleanup skipped: %s", e)
+
+@app.on_event("shutdown")
+async def _flush_store():
+    await asyncio.to_thread(services.store.flush)
+
+@app.on_event("shutdown")
+async def _stop_log_listener():
+    # Drains queued records before the process exits
+    _log_listener.stop()
+
 # =======================
 # 8. API ENDPOINTS
 # =======================
 
-@app.get("/", response_class=HTMLResponse)
-async def get_frontend():
-    """Serves the main frontend interface."""
-    html_content = """
+# CSS/JS are served from /static with far-future caching; the query string carries a
+# content hash so a changed file gets a new URL
+STATIC_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "static")
+
+
+class ImmutableStaticFiles(StaticFiles):
+    """StaticFiles whose responses may be cached by browsers for a year."""
+
+    def file_response(self, *args, **kwargs):
+        response = super().file_response(*args, **kwargs)
+        response.headers["Cache-Control"] = "public, max-age=31536000, immutable"
+        return response
+
+
+def _asset_version(name: str) -> str:
+    with open(os.path.join(STATIC_DIR, name), "rb") as f:
+        return hashlib.md5(f.read()).hexdigest()[:12]
+
+
+app.mount("/static", ImmutableStaticFiles(directory=STATIC_DIR), name="static")
+# Edited images get a fresh name per generation, so they are immutable too; the
+# directory is created at startup, after the mount
+app.mount("/edited", ImmutableStaticFiles(directory=EDITED_DIR, check_dir=False), name="edited")
+
+# The frontend is static: build the page and its response once at import
+_FRONTEND_HTML = """
     <!DOCTYPE html>
     <html lang="en">
     <head>
         <meta charset="UTF-8">
         <meta name="viewport" content="width=device-width, initial-scale=1.0">
         <title>Welfare Scheme Assistant</title>
-        <style>
-            * { margin: 0; padding: 0; box-sizing: border-box; }
-            body { 
-                font-family: 'Segoe UI', Tahoma, Geneva, Verdana, sans-serif;
-                background: linear-gradient(135deg, #667eea 0%, #764ba2 100%);
-                height: 100vh; display: flex; align-items: center; justify-content: center;
-            }
-            .chat-container {
-                background: white; border-radius: 20px; box-shadow: 0 20px 40px rgba(0,0,0,0.1);
-                width: 800px; height: 600px; display: flex; flex-direction: column; overflow: hidden;
-            }
-            .chat-header {
-                background: #4f46e5; color: white; padding: 20px; text-align: center;
-                font-size: 1.5em; font-weight: bold; display: flex; justify-content: space-between; align-items: center;
-            }
-            .notification-btn {
-                background: rgba(255,255,255,0.2); color: white; border: none; padding: 8px 16px;
-                border-radius: 20px; cursor: pointer; font-size: 0.8em; transition: all 0.3s;
-            }
-            .notification-btn:hover {
-                background: rgba(255,255,255,0.3); transform: scale(1.05);
-            }
-            .chat-messages {
-                flex: 1; padding: 20px; overflow-y: auto; background: #f8fafc;
-            }
-            .message {
-                margin: 10px 0; padding: 12px 16px; border-radius: 12px; max-width: 80%;
-            }
-            .user-message {
-                background: #4f46e5; color: white; margin-left: auto; text-align: right;
-            }
-            .ai-message {
-                background: white; border: 1px solid #e2e8f0; color: #374151;
-            }
-            .chat-input {
-                display: flex; padding: 20px; background: white; border-top: 1px solid #e2e8f0;
-            }
-            .chat-input input {
-                flex: 1; padding: 12px; border: 1px solid #d1d5db; border-radius: 8px;
-                font-size: 16px; outline: none;
-            }
-            .chat-input button {
-                margin-left: 10px; padding: 12px 20px; background: #4f46e5; color: white;
-                border: none; border-radius: 8px; cursor: pointer; font-weight: bold;
-            }
-            .chat-input button:hover { background: #4338ca; }
-            .typing-indicator { 
-                display: none; color: #6b7280; font-style: italic; margin: 10px 0;
-            }
-            
-            /* Modal Styles */
-            .modal {
-                display: none; position: fixed; z-index: 1000; left: 0; top: 0; 
-                width: 100%; height: 100%; background-color: rgba(0,0,0,0.5);
-            }
-            .modal-content {
-                background-color: white; margin: 5% auto; padding: 0; border-radius: 15px;
-                width: 90%; max-width: 600px; box-shadow: 0 20px 40px rgba(0,0,0,0.3);
-            }
-            .modal-header {
-                background: linear-gradient(135deg, #667eea 0%, #764ba2 100%);
-                color: white; padding: 20px; border-radius: 15px 15px 0 0;
-                display: flex; justify-content: space-between; align-items: center;
-            }
-            .modal-header h2 {
-                margin: 0; font-size: 1.5em;
-            }
-            .close {
-                color: white; font-size: 28px; font-weight: bold; cursor: pointer;
-                transition: color 0.3s;
-            }
-            .close:hover {
-                color: #f1f1f1;
-            }
-            .modal-body {
-                padding: 20px; max-height: 500px; overflow-y: auto;
-            }
-            .scheme-card {
-                background: linear-gradient(135deg, #f8fafc 0%, #e2e8f0 100%);
-                border-radius: 15px; padding: 20px; margin: 15px 0;
-                border-left: 5px solid #4f46e5; transition: all 0.3s;
-                cursor: pointer; position: relative; overflow: hidden;
-                box-shadow: 0 4px 15px rgba(0,0,0,0.08);
-            }
-            .scheme-card:hover {
-                transform: translateY(-5px); box-shadow: 0 15px 35px rgba(0,0,0,0.15);
-                border-left-width: 8px;
-            }
-            .scheme-card:active {
-                transform: translateY(-2px); transition: all 0.1s;
-            }
-            .top-scheme {
-                background: linear-gradient(135deg, #fef3c7 0%, #fbbf24 100%);
-                border-left-color: #f59e0b; box-shadow: 0 8px 25px rgba(245, 158, 11, 0.3);
-            }
-            .top-badge {
-                position: absolute; top: -5px; right: -5px; 
-                background: #ef4444; color: white; padding: 5px 15px;
-                border-radius: 0 15px 0 15px; font-size: 0.75em; font-weight: bold;
-                animation: pulse 2s infinite;
-            }
-            .urgent-badge {
-                position: absolute; top: 15px; right: 15px;
-                background: #dc2626; color: white; padding: 4px 8px;
-                border-radius: 12px; font-size: 0.7em; font-weight: bold;
-                animation: blink 1.5s infinite;
-            }
-            @keyframes pulse {
-                0%, 100% { opacity: 1; }
-                50% { opacity: 0.7; }
-            }
-            @keyframes blink {
-                0%, 50% { opacity: 1; }
-                51%, 100% { opacity: 0.6; }
-            }
-            .scheme-title {
-                font-size: 1.3em; font-weight: bold; color: #1e293b; margin-bottom: 10px;
-                line-height: 1.2; text-shadow: 0 1px 2px rgba(0,0,0,0.1);
-            }
-            .scheme-description {
-                color: #475569; margin-bottom: 15px; line-height: 1.6;
-                font-size: 0.95em;
-            }
-            .scheme-details {
-                display: flex; flex-wrap: wrap; gap: 8px; margin-bottom: 12px;
-            }
-            .scheme-tag {
-                background: #e0e7ff; color: #3730a3; padding: 5px 12px;
-                border-radius: 20px; font-size: 0.8em; font-weight: 500;
-            }
-            .scheme-benefit {
-                background: linear-gradient(135deg, #dcfce7 0%, #22c55e 100%); 
-                color: #166534; padding: 6px 14px;
-                border-radius: 20px; font-size: 0.85em; font-weight: 700;
-                box-shadow: 0 2px 8px rgba(34, 197, 94, 0.3);
-            }
-            .priority-tag {
-                padding: 4px 10px; border-radius: 15px; font-size: 0.75em; 
-                font-weight: 600; color: white;
-            }
-            .priority-tag.priority-high {
-                background: linear-gradient(135deg, #ef4444 0%, #dc2626 100%);
-            }
-            .priority-tag.priority-medium {
-                background: linear-gradient(135deg, #f59e0b 0%, #d97706 100%);
-            }
-            .priority-tag.priority-low {
-                background: linear-gradient(135deg, #10b981 0%, #059669 100%);
-            }
-            .eligibility-section {
-                font-size: 0.9em; color: #64748b; margin: 12px 0;
-                padding: 10px; background: rgba(248, 250, 252, 0.8);
-                border-radius: 8px; border-left: 3px solid #10b981;
-            }
-            .cta-button {
-                background: linear-gradient(135deg, #4f46e5 0%, #7c3aed 100%);
-                color: white; padding: 12px 20px; border-radius: 25px;
-                text-align: center; font-weight: bold; margin-top: 15px;
-                box-shadow: 0 4px 15px rgba(79, 70, 229, 0.4);
-                transition: all 0.3s; font-size: 0.9em;
-            }
-            .cta-button:hover {
-                transform: translateY(-2px); box-shadow: 0 6px 20px rgba(79, 70, 229, 0.6);
-            }
-            .priority-high {
-                border-left-color: #ef4444; animation: subtleGlow 3s infinite;
-            }
-            .priority-medium {
-                border-left-color: #f59e0b;
-            }
-            .priority-low {
-                border-left-color: #10b981;
-            }
-            @keyframes subtleGlow {
-                0%, 100% { box-shadow: 0 4px 15px rgba(0,0,0,0.08); }
-                50% { box-shadow: 0 4px 15px rgba(239, 68, 68, 0.2); }
-            }
-            .loading {
-                text-align: center; padding: 40px; color: #6b7280;
-            }
-        </style>
+        <link rel="stylesheet" href="/static/app.css?v={css_version}">
     </head>
     <body>
         <div class="chat-container">
@@ -1217,219 +2071,94 @@ async def get_frontend():
             </div>
         </div>
 
-        <script>
-            const chatMessages = document.getElementById('chatMessages');
-            const messageInput = document.getElementById('messageInput');
-            const typingIndicator = document.getElementById('typingIndicator');
-            
-            let userId = 'user_' + Math.random().toString(36).substr(2, 9);
-
-            function addMessage(content, isUser) {
-                const messageDiv = document.createElement('div');
-                messageDiv.className = `message ${isUser ? 'user-message' : 'ai-message'}`;
-                messageDiv.textContent = content;
-                
-                chatMessages.appendChild(messageDiv);
-                chatMessages.scrollTop = chatMessages.scrollHeight;
-            }
+        <!-- Scheme card, cloned once per notification by displayNotifications() -->
+        <template id="schemeCardTpl">
+            <div class="scheme-card">
+                <div class="top-badge" hidden>🏆 BEST MATCH</div>
+                <div class="urgent-badge" hidden>⚡ HIGH PRIORITY</div>
 
-            function showTyping() {
-                typingIndicator.style.display = 'block';
-                chatMessages.scrollTop = chatMessages.scrollHeight;
-            }
+                <div class="scheme-title"></div>
+                <div class="scheme-description"></div>
 
-            function hideTyping() {
-                typingIndicator.style.display = 'none';
-            }
+                <div class="scheme-details">
+                    <span class="scheme-benefit"></span>
+                    <span class="scheme-tag"></span>
+                    <span class="priority-tag" hidden></span>
+                </div>
 
-            async function sendMessage() {
-                const message = messageInput.value.trim();
-                if (!message) return;
-
-                addMessage(message, true);
-                messageInput.value = '';
-                showTyping();
-
-                try {
-                    const response = await fetch('/chat', {
-                        method: 'POST',
-                        headers: { 'Content-Type': 'application/json' },
-                        body: JSON.stringify({ message: message, user_id: userId })
-                    });
-
-                    const data = await response.json();
-                    hideTyping();
-                    
-                    addMessage(data.response, false);
-                } catch (error) {
-                    hideTyping();
-                    addMessage('Sorry, there was an error processing your request.', false);
-                    console.error('Error:', error);
-                }
-            }
+                <div class="eligibility-section">
+                    <strong>✅ Eligibility:</strong> <span class="scheme-eligibility"></span>
+                </div>
 
-            messageInput.addEventListener('keypress', function(e) {
-                if (e.key === 'Enter') sendMessage();
-            });
-
-            // Focus input on load
-            messageInput.focus();
-
-            // Image edit handler
-            const imageEditForm = document.getElementById('imageEditForm');
-            imageEditForm.addEventListener('submit', async (e) => {
-                e.preventDefault();
-                const fileInput = document.getElementById('imageFile');
-                const statusEl = document.getElementById('imageEditStatus');
-                const previewEl = document.getElementById('editedPreview');
-                if (!fileInput.files || fileInput.files.length === 0) {
-                    statusEl.textContent = 'Please choose an image file.';
-                    return;
-                }
-                statusEl.textContent = 'Editing image...';
-                previewEl.innerHTML = '';
-
-                const formData = new FormData();
-                formData.append('user_id', userId);
-                formData.append('image', fileInput.files[0]);
-
-                try {
-                    const resp = await fetch('/image/edit', { method: 'POST', body: formData });
-                    const data = await resp.json();
-                    if (!resp.ok) throw new Error(data.detail || 'Image edit failed');
-
-                    statusEl.textContent = 'Done!';
-                    if (data.image_base64) {
-                        const img = document.createElement('img');
-                        img.src = `data:image/png;base64,${data.image_base64}`;
-                        img.style.maxWidth = '100%';
-                        img.style.border = '1px solid #e5e7eb';
-                        img.style.borderRadius = '8px';
-                        previewEl.appendChild(img);
-                    } else if (data.saved_uploaded_path) {
-                        statusEl.textContent = 'Uploaded saved. No edited image returned.';
-                    }
-                } catch (err) {
-                    console.error(err);
-                    statusEl.textContent = 'Error editing image.';
-                }
-            });
-
-            // Notification functions
-            async function showNotifications() {
-                const modal = document.getElementById('notificationModal');
-                const content = document.getElementById('notificationContent');
-                
-                modal.style.display = 'block';
-                content.innerHTML = '<div class="loading">Loading your personalized recommendations...</div>';
-                
-                try {
-                    const response = await fetch(`/user/${userId}/notifications`);
-                    if (response.ok) {
-                        const data = await response.json();
-                        displayNotifications(data.notifications);
-                    } else if (response.status === 404) {
-                        content.innerHTML = `
-                            <div style="text-align: center; padding: 40px;">
-                                <h3>Complete Your Profile First</h3>
-                                <p>Please complete the onboarding process to get personalized scheme recommendations.</p>
-                                <button onclick="closeNotifications()" style="background: #4f46e5; color: white; border: none; padding: 10px 20px; border-radius: 8px; cursor: pointer;">
-                                    Continue Chat
-                                </button>
-                            </div>
-                        `;
-                    } else {
-                        content.innerHTML = '<div class="loading">Error loading recommendations. Please try again.</div>';
-                    }
-                } catch (error) {
-                    console.error('Error:', error);
-                    content.innerHTML = '<div class="loading">Error loading recommendations. Please try again.</div>';
-                }
-            }
+                <div class="cta-button" hidden></div>
+            </div>
+        </template>
 
-            function displayNotifications(notifications) {
-                const content = document.getElementById('notificationContent');
-                
-                if (!notifications || notifications.length === 0) {
-                    content.innerHTML = '<div class="loading">No recommendations available at this time.</div>';
-                    return;
-                }
-                
-                let html = `<div style="margin-bottom: 20px; text-align: center; color: #6b7280;">
-                    🎯 <strong>${notifications.length} Exclusive Benefits</strong> handpicked for you!
-                </div>`;
-                
-                notifications.forEach((scheme, index) => {
-                    const priorityClass = scheme.priority ? `priority-${scheme.priority.toLowerCase()}` : '';
-                    const isTopScheme = index === 0; // Highlight first scheme
-                    
-                    html += `
-                        <div class="scheme-card ${priorityClass} ${isTopScheme ? 'top-scheme' : ''}" onclick="handleSchemeClick('${scheme.title}')">
-                            ${isTopScheme ? '<div class="top-badge">🏆 BEST MATCH</div>' : ''}
-                            ${scheme.priority === 'High' ? '<div class="urgent-badge">⚡ HIGH PRIORITY</div>' : ''}
-                            
-                            <div class="scheme-title">${scheme.title}</div>
-                            <div class="scheme-description">${scheme.description}</div>
-                            
-                            <div class="scheme-details">
-                                <span class="scheme-benefit">💰 ${scheme.benefit_amount}</span>
-                                <span class="scheme-tag">${scheme.category || 'Government Scheme'}</span>
-                                ${scheme.priority ? `<span class="priority-tag priority-${scheme.priority.toLowerCase()}">${scheme.priority} Priority</span>` : ''}
-                            </div>
-                            
-                            <div class="eligibility-section">
-                                <strong>✅ Eligibility:</strong> ${scheme.eligibility}
-                            </div>
-                            
-                            ${scheme.call_to_action ? `
-                                <div class="cta-button">
-                                    ${scheme.call_to_action} →
-                                </div>
-                            ` : ''}
-                        </div>
-                    `;
-                });
-                
-                html += `
-                    <div style="text-align: center; margin-top: 20px; padding: 15px; background: #f8fafc; border-radius: 10px;">
-                        <p style="color: #6b7280; margin: 0;">💡 <strong>Pro Tip:</strong> Apply for multiple schemes to maximize your benefits!</p>
-                    </div>
-                `;
-                
-                content.innerHTML = html;
-            }
+        <script src="/static/app.js?v={js_version}"></script>
+    </body>
+    </html>
+    """.format(css_version=_asset_version("app.css"), js_version=_asset_version("app.js"))
+# Browsers may reuse the page for an hour, then revalidate with If-None-Match
+_FRONTEND_HASH = hashlib.md5(_FRONTEND_HTML.encode()).hexdigest()
+_FRONTEND_CACHE_HEADERS = {
+    "Cache-Control": "public, max-age=3600",
+    "ETag": f'"{_FRONTEND_HASH}"',
+    "Vary": "Accept-Encoding",
+}
+_FRONTEND_BODY = _FRONTEND_HTML.encode()
+# Compressed once at maximum level; TextGZipMiddleware passes already-encoded bodies through
+_FRONTEND_GZIP_BODY = gzip.compress(_FRONTEND_BODY, compresslevel=9, mtime=0)
+_FRONTEND_GZIP_HEADERS = {**_FRONTEND_CACHE_HEADERS, "ETag": f'"{_FRONTEND_HASH}-gzip"', "Content-Encoding": "gzip"}
 
-            function handleSchemeClick(schemeTitle) {
-                // Add some interaction feedback
-                console.log('User clicked on scheme:', schemeTitle);
-                // You can add more functionality here like opening application forms
-            }
+@app.get("/", response_class=HTMLResponse)
+async def get_frontend(request: Request):
+    """Serves the main frontend interface."""
+    # Only the bytes and header dicts are shared: middleware edits a response's headers
+    # in place (GZipMiddleware appends to Vary), so each request gets its own Response
+    if _FRONTEND_HASH in request.headers.get("if-none-match", ""):
+        return Response(status_code=304, headers=_FRONTEND_CACHE_HEADERS)
+    if "gzip" in request.headers.get("accept-encoding", ""):
+        return HTMLResponse(content=_FRONTEND_GZIP_BODY, headers=_FRONTEND_GZIP_HEADERS)
+    return HTMLResponse(content=_FRONTEND_BODY, headers=_FRONTEND_CACHE_HEADERS)
+
+# How many trailing messages /chat inspects for the reply
+LAST_AI_MESSAGE_WINDOW = 5
+
+async def _chat_result_body(user_id: str, result_state: Dict) -> Dict:
+    """Build the /chat response body (ChatResponse fields) from a finished workflow state."""
+    # The final response is the last AIMessage; nodes append it at the tail, so only
+    # a short window at the end is checked instead of the whole history
+    final_response = ""
+    if result_state and result_state.get('messages'):
+        final_response = next(
+            (m.content for m in reversed(result_state['messages'][-LAST_AI_MESSAGE_WINDOW:])
+             if isinstance(m, AIMessage)),
+            "",
+        )
 
-            function getPriorityColor(priority) {
-                switch(priority.toLowerCase()) {
-                    case 'high': return '#ef4444';
-                    case 'medium': return '#f59e0b';
-                    case 'low': return '#10b981';
-                    default: return '#6b7280';
-                }
-            }
+    if logger.isEnabledFor(logging.DEBUG):
+        logger.debug("Workflow result: onboarding=%s, response=%s...", result_state.get('is_onboarding'), final_response[:100])
+    
+    # Get user profile if it was created
+    user_profile = result_state.get('user_profile_data', {})
+    if not user_profile:
+        try:
+            user_profile = await asyncio.to_thread(services.store.get_user_profile, user_id) or {}
+        except Exception as e:
+            logger.error("Error retrieving profile from store: %s", e)
 
-            function closeNotifications() {
-                document.getElementById('notificationModal').style.display = 'none';
-            }
+    # Profiles are string-only when written to state or read from the store; only state
+    # checkpointed by older versions still needs converting
+    if any(not isinstance(v, str) for v in user_profile.values()):
+        user_profile = coerce_profile_to_strings(user_profile)
 
-            // Close modal when clicking outside
-            window.onclick = function(event) {
-                const modal = document.getElementById('notificationModal');
-                if (event.target === modal) {
-                    closeNotifications();
-                }
-            }
-        </script>
-    </body>
-    </html>
-    """
-    return HTMLResponse(content=html_content)
+    return {
+        "response": final_response or "I'm sorry, I couldn't process that request.",
+        "is_onboarding": result_state.get("is_onboarding", False),
+        "onboarding_step": result_state.get("onboarding_step"),
+        "user_profile": user_profile,
+        "backstory": result_state.get("backstory"),
+    }
 
 @app.post("/chat", response_model=ChatResponse)
 async def chat_endpoint(chat_message: ChatMessage):
@@ -1437,58 +2166,20 @@ async def chat_endpoint(chat_message: ChatMessage):
     try:
         config = {"configurable": {"thread_id": chat_message.user_id}}
         
-        # Get the current state from the checkpointer to continue the conversation
-        current_state = services.workflow.get_state(config)
-        
-        if current_state and current_state.values:
-            # If there's an existing state, add the new message to it
-            print("Continuing existing conversation.")
-            messages = current_state.values.get("messages", []) + [HumanMessage(content=chat_message.message)]
-            # Pass the whole state to continue properly
-            input_state = current_state.values
-            input_state["messages"] = messages
-        else:
-            # If no state, this is a new conversation
-            print("Starting new conversation.")
-            input_state = {
-                "messages": [HumanMessage(content=chat_message.message)],
-                "user_id": chat_message.user_id
-            }
+        # The checkpointer restores the rest of the state; the reducer appends the new message
+        input_state = {
+            "messages": [HumanMessage(content=chat_message.message)],
+            "user_id": chat_message.user_id
+        }
 
         # Execute workflow with the correct state
-        result_state = services.workflow.invoke(input_state, config)
-        
-        # The final response is in the last AIMessage in the 'messages' list
-        final_response = ""
-        if result_state and result_state.get('messages'):
-            # Find the last AI message in the list
-            for msg in reversed(result_state['messages']):
-                if isinstance(msg, AIMessage):
-                    final_response = msg.content
-                    break
-
-        print(f"Workflow result: onboarding={result_state.get('is_onboarding')}, response={final_response[:100]}...")
+        result_state = await services.workflow.ainvoke(input_state, config)
         
-        # Get user profile if it was created
-        user_profile = result_state.get('user_profile_data', {})
-        if not user_profile:
-            try:
-                user_profile = services.store.get_user_profile(chat_message.user_id) or {}
-            except Exception as e:
-                print(f"Error retrieving profile from store: {e}")
-
-        return ChatResponse(
-            response=final_response or "I'm sorry, I couldn't process that request.",
-            is_onboarding=result_state.get("is_onboarding", False),
-            onboarding_step=result_state.get("onboarding_step"),
-            user_profile=coerce_profile_to_strings(user_profile),
-            backstory=result_state.get("backstory")
-        )
+        # Returned as a response object so FastAPI skips re-validating it against ChatResponse
+        return ORJSONResponse(await _chat_result_body(chat_message.user_id, result_state))
 
     except Exception as e:
-        print(f"Chat endpoint error: {e}")
-        import traceback
-        traceback.print_exc()
+        logger.exception("Chat endpoint error: %s", e)
         raise HTTPException(status_code=500, detail=f"Internal server error: {str(e)}")
 
 @app.get("/user/{user_id}/profile", response_model=UserProfile)
@@ -1499,15 +2190,14 @@ async def get_user_profile(user_id: str):
         if not user_id or len(user_id.strip()) == 0:
             raise HTTPException(status_code=400, detail="Invalid user ID")
         
-        profile_data = services.store.get_user_profile(user_id)
+        profile_data = await asyncio.to_thread(services.store.get_user_profile, user_id)
         if not profile_data:
             raise HTTPException(status_code=404, detail="User profile not found")
         
-        # Remove user_id from profile_data to avoid conflict when unpacking
-        profile_data_copy = profile_data.copy()
-        profile_data_copy.pop('user_id', None)  # Remove user_id if it exists
-        
-        return UserProfile(user_id=user_id, **profile_data_copy)
+        # Project straight onto the UserProfile fields; no model instance to build and re-serialize
+        content = {field: profile_data.get(field) for field in USER_PROFILE_FIELDS}
+        content["user_id"] = user_id
+        return ORJSONResponse(content)
     except HTTPException:
         raise  # Re-raise HTTP exceptions as-is
     except Exception as e:
@@ -1519,7 +2209,7 @@ async def get_user_backstory(user_id: str):
     try:
         if not user_id or len(user_id.strip()) == 0:
             raise HTTPException(status_code=400, detail="Invalid user ID")
-        profile_data = services.store.get_user_profile(user_id)
+        profile_data = await asyncio.to_thread(services.store.get_user_profile, user_id)
         if not profile_data:
             raise HTTPException(status_code=404, detail="User profile not found")
         backstory = profile_data.get('backstory')
@@ -1531,59 +2221,148 @@ async def get_user_backstory(user_id: str):
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error retrieving backstory: {str(e)}")
 
-@app.post("/image/edit")
-async def edit_image(
-    user_id: str = Form(...),
-    image: UploadFile = File(...),
-    prompt: Optional[str] = Form(None)
-):
-    """Edits an image using the artisan's user profile to build a default prompt.
-    Saves both the uploaded and generated images locally and returns base64 for display.
+_image_edit_semaphore = asyncio.Semaphore(IMAGE_EDIT_CONCURRENCY)
+_description_semaphore = asyncio.Semaphore(DESCRIPTION_CONCURRENCY)
+
+# Keyed by "<model>:<location>"; during a provider outage requests skip the failing
+# pairs instead of walking the whole fallback chain on every upload
+_image_breaker = CircuitBreaker()
+
+_image_edit_flights = SingleFlight()
+
+# Deferred description writes; held here because the loop keeps only weak references to
+# tasks, and they must outlive whichever request happened to lead the flight
+_description_writes: set = set()
+
+# Generation settings never change between requests; built once and shared
+_IMAGE_GENERATE_CONFIG = types.GenerateContentConfig(
+    temperature=1,
+    top_p=0.95,
+    max_output_tokens=32768,
+    response_modalities=["TEXT", "IMAGE"],
+    safety_settings=[
+        types.SafetySetting(category=category, threshold="OFF")
+        for category in (
+            "HARM_CATEGORY_HATE_SPEECH",
+            "HARM_CATEGORY_DANGEROUS_CONTENT",
+            "HARM_CATEGORY_SEXUALLY_EXPLICIT",
+            "HARM_CATEGORY_HARASSMENT",
+        )
+    ],
+)
+
+async def _acquire_image_edit_slot():
+    """Wait for an image generation slot, or answer 503 once the queue timeout passes."""
+    try:
+        await asyncio.wait_for(_image_edit_semaphore.acquire(), IMAGE_EDIT_QUEUE_TIMEOUT_SECONDS)
+    except asyncio.TimeoutError:
+        raise HTTPException(status_code=503, detail="Image editing is busy, please try again shortly")
+
+async def _read_upload(upload: UploadFile) -> tuple:
+    """Read an upload in chunks, hashing as it goes; returns (bytes, blake2b hex digest).
+
+    Answers 413 as soon as MAX_UPLOAD_BYTES is exceeded, without reading the rest.
+    """
+    hasher = hashlib.blake2b(digest_size=16)
+    chunks = []
+    size = 0
+    while True:
+        chunk = await upload.read(UPLOAD_READ_CHUNK_BYTES)
+        if not chunk:
+            break
+        size += len(chunk)
+        if size > MAX_UPLOAD_BYTES:
+            raise HTTPException(status_code=413, detail=f"Image exceeds {MAX_UPLOAD_BYTES // (1024 * 1024)} MB")
+        hasher.update(chunk)
+        chunks.append(chunk)
+    return b"".join(chunks), hasher.hexdigest()
+
+async def describe_image(kind: str, profile_json: str, prompt: str) -> str:
+    """Write a product description with the `<kind>_chain` ('image_description' or
+    'fallback_description'), reusing a cached answer for the same kind, profile and prompt.
+
+    profile_json is the sanitized profile serialized with sort_keys=True, so equal
+    profiles always produce the same cache key.
     """
+    key = hashlib.sha256(
+        json.dumps({"kind": kind, "profile": profile_json, "prompt": prompt}).encode("utf-8")
+    ).hexdigest()
+    cached = services.description_cache.get(key)
+    if cached is not None:
+        return cached
+    chain = getattr(services, f"{kind}_chain")
+    async with _description_semaphore:
+        text = message_text(await chain.ainvoke({
+            "profile": profile_json,
+            "prompt": prompt,
+        })).strip()
+    services.description_cache[key] = text
+    return text
+
+async def _store_description_when_ready(record_id: int, desc_task: "asyncio.Task") -> None:
+    """Save a description that was still being written when /image/edit returned."""
+    try:
+        text = await desc_task
+        await asyncio.to_thread(services.store.update_media_description, record_id, text)
+    except Exception as e:
+        logger.exception("Deferred description for media %s failed: %s", record_id, e)
+
+async def _edit_image(
+    user_id: str,
+    prompt: Optional[str],
+    image_bytes: bytes,
+    digest: str,
+) -> Dict:
+    """Body of /image/edit, run once per distinct (user, prompt, upload) in flight."""
     try:
-        if not user_id or not user_id.strip():
-            raise HTTPException(status_code=400, detail="user_id is required")
-        if not image or not image.filename:
-            raise HTTPException(status_code=400, detail="Image file is required")
         # Look up profile for prompt construction
         try:
-            profile = services.store.get_user_profile(user_id) or {}
+            profile = await asyncio.to_thread(services.store.get_user_profile, user_id) or {}
         except Exception:
             profile = {}
+        # Sanitized once and shared by the description call and the response
+        prof_for_prompt = sanitize_profile(profile)
+        profile_json = json.dumps(prof_for_prompt, sort_keys=True)
 
         # Build a default prompt from profile if not provided
         if not prompt or not prompt.strip():
-            name = profile.get('name') or 'the artisan'
-            craft = profile.get('craft_type') or 'handmade crafts'
-            style = profile.get('brand_style') or 'warm, natural, earthy'
-            region = profile.get('state') or ''
-            prompt = (
-    f"Edit/enhance this photo for {name}, a {craft} artisan"
-    + (f" from {region}." if region else ".")
-    + f" Keep the style {style}. Improve lighting and colors, keep it authentic, no text or watermarks. "
-    + "Do not change the main product in the image—just make it look better. "
-    + "Change or enhance the background so it matches the type of product and looks suitable for advertising but not make it completely different." + 'Make it suitable for use on an e-commerce website. and look like a product photo taken from dslr'
-)
-
-        # Read bytes first (UploadFile stream can only be read once)
-        image_bytes = await image.read()
-
-        # Ensure folders exist
-        uploads_dir = os.path.join(os.getcwd(), "uploads")
-        edited_dir = os.path.join(os.getcwd(), "edited")
-        os.makedirs(uploads_dir, exist_ok=True)
-        os.makedirs(edited_dir, exist_ok=True)
+            prompt = default_image_edit_prompt(
+                str(profile.get('name') or 'the artisan'),
+                str(profile.get('craft_type') or 'handmade crafts'),
+                str(profile.get('brand_style') or 'warm, natural, earthy'),
+                str(profile.get('state') or ''),
+            )
 
-        # Save uploaded image to uploads
-        upload_name = f"upload_{uuid4().hex}_{image.filename}"
-        upload_path = os.path.join(uploads_dir, upload_name)
-        with open(upload_path, 'wb') as f:
-            f.write(image_bytes)
+        # Decoding a large upload can take as much memory as the model call, so the image
+        # edit slot is taken before it and held until generation finishes
+        await _acquire_image_edit_slot()
+        try:
+            # The original is written to disk and a possibly downscaled copy is sent to the model
+            try:
+                model_image_bytes, mime = await asyncio.to_thread(prepare_upload_image, image_bytes)
+            except ValueError as e:
+                raise HTTPException(status_code=400, detail=str(e))
+
+            # Save uploaded image to uploads (directories are created at startup). The name is a
+            # hash of the content, so the client's filename never reaches the filesystem and
+            # re-uploads of the same photo are stored once
+            upload_name = f"upload_{digest}{IMAGE_MIME_EXTENSIONS[mime]}"
+            upload_path = os.path.join(UPLOADS_DIR, upload_name)
+            await asyncio.to_thread(write_bytes_if_missing, upload_path, image_bytes)
+        except BaseException:
+            _image_edit_semaphore.release()
+            raise
 
         # Use google-genai client if available to generate an edited image
         if getattr(services, 'genai_client', None):
+            desc_task = None
             try:
-                mime = image.content_type or 'image/png'
+                # The description depends only on the prompt and profile, not on the edited
+                # image, so it is written while the image model works
+                desc_task = asyncio.create_task(describe_image("image_description", profile_json, prompt))
+                # Mark a failure as retrieved even if generation fails first and it is never awaited
+                desc_task.add_done_callback(lambda t: t.cancelled() or t.exception())
+
                 contents = [
                     types.Content(
                         role="user",
@@ -1592,73 +2371,73 @@ async def edit_image(
                             types.Part(
                                 inline_data=types.Blob(
                                     mime_type=mime,
-                                    data=image_bytes,
+                                    data=model_image_bytes,
                                 )
                             ),
                         ],
                     )
                 ]
 
-                generate_content_config = types.GenerateContentConfig(
-                    temperature=1,
-                    top_p=0.95,
-                    max_output_tokens=32768,
-                    response_modalities=["TEXT", "IMAGE"],
-                    safety_settings=[
-                        types.SafetySetting(category="HARM_CATEGORY_HATE_SPEECH", threshold="OFF"),
-                        types.SafetySetting(category="HARM_CATEGORY_DANGEROUS_CONTENT", threshold="OFF"),
-                        types.SafetySetting(category="HARM_CATEGORY_SEXUALLY_EXPLICIT", threshold="OFF"),
-                        types.SafetySetting(category="HARM_CATEGORY_HARASSMENT", threshold="OFF"),
-                    ],
-                )
-
                 # Preferred model (user override first, then preview image model)
-                model = os.environ.get("GEMINI_IMAGE_MODEL", "gemini-2.5-flash-image-preview")
-
-                # Helper to try a call and optionally rebuild client with a different location
-                def _try_generate(client, mdl):
-                    return client.models.generate_content(
-                        model=mdl,
-                        contents=contents,
-                        config=generate_content_config,
-                    )
+                model = IMAGE_GEN_CONFIG.image_model
+
+                # Helper to try a call and optionally rebuild client with a different location;
+                # the async API keeps the event loop (and desc_task) running meanwhile
+                async def _try_generate(client, mdl, loc):
+                    key = f"{mdl}:{loc}"
+                    if not _image_breaker.allow(key):
+                        raise CircuitOpenError(f"{key} is failing, skipped")
+                    try:
+                        result = await client.aio.models.generate_content(
+                            model=mdl,
+                            contents=contents,
+                            config=_IMAGE_GENERATE_CONFIG,
+                        )
+                    except genai_errors.APIError as api_err:
+                        # Only throttling and server errors say the upstream is unhealthy
+                        if api_err.code == 429 or (api_err.code or 0) >= 500:
+                            _image_breaker.record_failure(key)
+                        else:
+                            _image_breaker.record_success(key)
+                        raise
+                    except Exception:
+                        _image_breaker.record_failure(key)
+                        raise
+                    _image_breaker.record_success(key)
+                    return result
 
                 resp = None
                 err = None
+                proj_env = IMAGE_GEN_CONFIG.project
                 client_used = services.genai_client
+                loc_used = IMAGE_GEN_CONFIG.region if proj_env else "api-key"
                 model_used = model
 
                 try:
-                    resp = _try_generate(client_used, model_used)
-                except genai_errors.ClientError as ce:
+                    resp = await _try_generate(client_used, model_used, loc_used)
+                except (genai_errors.ClientError, CircuitOpenError) as ce:
                     err = ce
                     # If Vertex + NotFound or InvalidArgument, try changing location to us-central1/global fallback
-                    loc_env = os.environ.get("GOOGLE_CLOUD_REGION") or os.environ.get("LOCATION") or "us-central1"
-                    proj_env = os.environ.get("GOOGLE_CLOUD_PROJECT") or os.environ.get("PROJECT_ID")
                     # Only attempt location swap if running Vertex mode (has project)
                     if proj_env:
-                        try_locations = [
-                            os.environ.get("LOCATION") or "global",
-                            "us-central1",
-                        ]
-                        for loc in try_locations:
+                        for loc in IMAGE_GEN_CONFIG.fallback_locations:
                             try:
-                                client_used = genai.Client(vertexai=True, project=proj_env, location=loc)
-                                resp = _try_generate(client_used, model_used)
+                                client_used, loc_used = services.vertex_client(proj_env, loc), loc
+                                resp = await _try_generate(client_used, model_used, loc_used)
                                 print(f"Image gen succeeded after location change to {loc}")
                                 break
-                            except genai_errors.ClientError as ce2:
+                            except (genai_errors.ClientError, CircuitOpenError) as ce2:
                                 err = ce2
                                 continue
                     # If still failing, try Imagen text-to-image model
                     if resp is None:
-                        for alt_model in ["imagen-3.0-generate-001", "gemini-2.0-flash-exp"]:
+                        for alt_model in IMAGE_GEN_CONFIG.alt_models:
                             try:
                                 model_used = alt_model
-                                resp = _try_generate(client_used, model_used)
+                                resp = await _try_generate(client_used, model_used, loc_used)
                                 print(f"Image gen succeeded with alternate model {alt_model}")
                                 break
-                            except genai_errors.ClientError as ce3:
+                            except (genai_errors.ClientError, CircuitOpenError) as ce3:
                                 err = ce3
                                 continue
                 except Exception as e:
@@ -1667,8 +2446,9 @@ async def edit_image(
                 if resp is None:
                     raise HTTPException(status_code=502, detail=f"Image generation failed: {err}")
 
-                # Extract image (base64) from response if present
-                def _extract_image_from_genai(r) -> Optional[Dict[str, str]]:
+                # Extract the raw image bytes from the response if present; base64 is only
+                # produced at the HTTP boundary, and only when it is actually returned
+                def _extract_image_from_genai(r) -> Optional[Dict[str, Any]]:
                     try:
                         # Prefer structured access
                         for cand in getattr(r, "candidates", []) or []:
@@ -1678,11 +2458,11 @@ async def edit_image(
                                 inline = getattr(p, "inline_data", None)
                                 if inline and getattr(inline, "data", None):
                                     data = inline.data
-                                    # Ensure base64 string
-                                    if isinstance(data, (bytes, bytearray)):
-                                        data = base64.b64encode(data).decode("ascii")
+                                    # google-genai decodes inline data to bytes already
+                                    if isinstance(data, str):
+                                        data = base64.b64decode(data)
                                     return {
-                                        "data": data,
+                                        "data_bytes": data,
                                         "mime": getattr(inline, "mime_type", "image/png"),
                                     }
                         # Also check top-level content
@@ -1692,94 +2472,97 @@ async def edit_image(
                                 inline = getattr(p, "inline_data", None)
                                 if inline and getattr(inline, "data", None):
                                     data = inline.data
-                                    if isinstance(data, (bytes, bytearray)):
-                                        data = base64.b64encode(data).decode("ascii")
+                                    if isinstance(data, str):
+                                        data = base64.b64decode(data)
                                     return {
-                                        "data": data,
+                                        "data_bytes": data,
                                         "mime": getattr(inline, "mime_type", "image/png"),
                                     }
                     except Exception:
                         pass
-                    # Fallback: stringify and regex search
+                    # Fallback: look for a data: URI near the start of the repr. Bounded, since
+                    # the repr of a response carrying an image can run to megabytes
                     try:
-                        s = str(r)
-                        m = re.search(r'data:image\/[^;]+;base64,([A-Za-z0-9+/=]+)', s)
-                        if m:
-                            return {"data": m.group(1), "mime": "image/png"}
-                        m2 = re.search(r'([A-Za-z0-9+/=]{200,})', s)
-                        if m2:
-                            return {"data": m2.group(1), "mime": "image/png"}
+                        head = repr(r)[:DATA_URI_SEARCH_LIMIT]
+                        # Fast path: str.find for the marker, then an anchored match for the
+                        # payload; the scanning regex is only a fallback. A payload running
+                        # into the end of head was cut off by the limit and would decode to a
+                        # partial image, so it counts as not found
+                        marker = head.find(";base64,")
+                        if marker != -1:
+                            start = head.rfind("data:", max(0, marker - 64), marker)
+                            run = _B64_RUN_RE.match(head, marker + 8)
+                            mime_found = head[start + 5:marker] if start != -1 else ""
+                            if run and run.end() < len(head) and mime_found.startswith("image/"):
+                                return {"data_bytes": base64.b64decode(run.group()), "mime": mime_found}
+                        m = _DATA_URI_B64_RE.search(head)
+                        if m and m.end() < len(head):
+                            return {"data_bytes": base64.b64decode(m.group(2)), "mime": m.group(1)}
                     except Exception:
                         pass
                     return None
 
                 image_info = _extract_image_from_genai(resp)
-                if image_info and image_info.get("data"):
-                    img_b64 = image_info["data"]
-                    mime_out = image_info.get("mime", "image/png")
-                    # Determine extension
-                    ext = ".png"
-                    if "jpeg" in mime_out or "jpg" in mime_out:
-                        ext = ".jpg"
-                    elif "webp" in mime_out:
-                        ext = ".webp"
+                if image_info and image_info.get("data_bytes"):
+                    edited_bytes = image_info["data_bytes"]
+                    mime_out = (image_info.get("mime") or "image/png").split(";", 1)[0].strip().lower()
+                    ext = IMAGE_MIME_EXTENSIONS.get(mime_out, ".png")
 
                     edited_name = f"edited_{uuid4().hex}{ext}"
-                    edited_path = os.path.join(edited_dir, edited_name)
+                    edited_path = os.path.join(EDITED_DIR, edited_name)
                     try:
-                        with open(edited_path, 'wb') as ef:
-                            ef.write(base64.b64decode(img_b64))
+                        await asyncio.to_thread(write_bytes, edited_path, edited_bytes)
                     except Exception as se:
                         print(f"Failed saving edited image: {se}")
                         edited_path = None
 
-                    # Generate a caption/description tailored to the user's profile
-                    try:
-                        prof_for_prompt = sanitize_profile(profile)
-                        desc_prompt = ChatPromptTemplate.from_template(
-                            """
-You are an assistant helping an Indian artisan describe a product photo for social media and catalog listings.
-Keep it short (35-60 words), warm, and authentic. Mention craft, materials, region or style if helpful. No emojis.
-
-User Profile (for context): {profile}
-Instruction or Prompt used: {prompt}
-
-Write a single paragraph product description suitable for e-commerce and Instagram.
-"""
-                        )
-                        desc_chain = desc_prompt | services.llm_gemini.bind_tools([{ "google_search": {} }]) | StrOutputParser()
-                        description_text = desc_chain.invoke({
-                            "profile": json.dumps(prof_for_prompt),
-                            "prompt": prompt,
-                        }).strip()
-                    except Exception:
-                        description_text = None
+                    # Caption/description tailored to the user's profile, started above. The
+                    # image is the result the user waits for, so the description is only
+                    # included if it is already done (e.g. a cache hit); otherwise it is saved
+                    # to the record after the response, see description_pending
+                    description_text = None
+                    if desc_task.done() and not desc_task.cancelled() and desc_task.exception() is None:
+                        description_text = desc_task.result()
 
-                    # Persist record into DB (store edited image blob too for portability)
+                    # Persist record into DB; the image lives on disk, the blob is only a
+                    # fallback for when the file could not be written
                     try:
-                        record_id = services.store.save_generated_media(
+                        record_id = await asyncio.to_thread(
+                            services.store.save_generated_media,
                             user_id=user_id,
                             description=description_text,
                             prompt_used=prompt,
                             model_used=model_used,
                             original_image_path=upload_path,
                             edited_image_path=edited_path,
-                            edited_image_blob=base64.b64decode(img_b64) if img_b64 else None,
+                            edited_image_blob=None if edited_path else edited_bytes,
                         )
                     except Exception as e:
                         print(f"Failed to save generated media: {e}")
                         record_id = None
 
+                    description_pending = record_id is not None and not desc_task.done()
+                    if description_pending:
+                        write = asyncio.create_task(_store_description_when_ready(record_id, desc_task))
+                        _description_writes.add(write)
+                        write.add_done_callback(_description_writes.discard)
+                        desc_task = None  # handed off, must not be cancelled below
+
                     return {
                         "message": "Image edit completed",
                         "record_id": record_id,
                         "prompt_used": prompt,
-                        "image_base64": img_b64,
+                        # The browser fetches the file from /edited; base64 is only inlined
+                        # when it could not be written to disk
+                        "edited_url": f"/edited/{edited_name}" if edited_path else None,
+                        "image_base64": None if edited_path else base64.b64encode(edited_bytes).decode("ascii"),
                         "saved_uploaded_path": upload_path,
                         "saved_edited_path": edited_path,
-                        "profile_used": prof_for_prompt if 'prof_for_prompt' in locals() else sanitize_profile(profile),
+                        "profile_used": prof_for_prompt,
                         "model_used": model_used,
                         "description": description_text,
+                        # When true, the description appears in /user/{id}/media shortly
+                        "description_pending": description_pending,
                     }
 
                 # If we couldn't extract an image, include text response for debugging
@@ -1794,31 +2577,25 @@ Write a single paragraph product description suitable for e-commerce and Instagr
                 print(f"Image generation failed: {e}")
                 traceback.print_exc()
                 raise HTTPException(status_code=500, detail=f"Image generation failed: {str(e)}")
-
-        # Fallback placeholder when image model not available
+            finally:
+                if desc_task is not None:
+                    desc_task.cancel()
+                _image_edit_semaphore.release()
+
+        # Fallback placeholder when image model not available (the branch above always
+        # returns or raises, releasing the slot itself)
+        _image_edit_semaphore.release()
         # Even if we don't have model, we can still store the upload as a media record with no edited image
         desc_text = None
         try:
-            prof_for_prompt = sanitize_profile(profile)
             if prompt:
-                desc_prompt = ChatPromptTemplate.from_template(
-                    """
-Write a concise, warm product description (35-60 words) for an artisan's image based on the prompt and profile. No emojis.
-
-Profile: {profile}
-Prompt: {prompt}
-"""
-                )
-                desc_chain = desc_prompt | services.llm_gemini.bind_tools([{ "google_search": {} }]) | StrOutputParser()
-                desc_text = desc_chain.invoke({
-                    "profile": json.dumps(prof_for_prompt),
-                    "prompt": prompt,
-                }).strip()
+                desc_text = await describe_image("fallback_description", profile_json, prompt)
         except Exception:
             pass
 
         try:
-            record_id = services.store.save_generated_media(
+            record_id = await asyncio.to_thread(
+                services.store.save_generated_media,
                 user_id=user_id,
                 description=desc_text,
                 prompt_used=prompt,
@@ -1843,6 +2620,34 @@ Prompt: {prompt}
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error editing image: {str(e)}")
 
+@app.post("/image/edit")
+async def edit_image(
+    user_id: str = Form(...),
+    image: UploadFile = File(...),
+    prompt: Optional[str] = Form(None)
+):
+    """Edits an image using the artisan's user profile to build a default prompt.
+    Saves both the uploaded and generated images locally and returns the edited image's URL.
+
+    Concurrent duplicates (same user, prompt and image bytes, e.g. a client retry) wait
+    for the edit already in flight instead of starting another one.
+    """
+    if not user_id or not user_id.strip():
+        raise HTTPException(status_code=400, detail="user_id is required")
+    if not image or not image.filename:
+        raise HTTPException(status_code=400, detail="Image file is required")
+    if image.content_type not in ALLOWED_IMAGE_TYPES:
+        raise HTTPException(status_code=415, detail="Only JPEG, PNG and WebP images are supported")
+
+    # Read bytes once (UploadFile stream can only be read once); the content digest is
+    # computed in the same pass and names the stored upload as well as keying the flight
+    image_bytes, digest = await _read_upload(image)
+
+    return await _image_edit_flights.run(
+        (user_id, prompt or "", digest),
+        lambda: _edit_image(user_id, prompt, image_bytes, digest),
+    )
+
 @app.delete("/user/{user_id}/profile")
 async def delete_user_profile(user_id: str):
     """Deletes a user's profile (for testing/reset purposes)."""
@@ -1852,11 +2657,11 @@ async def delete_user_profile(user_id: str):
             raise HTTPException(status_code=400, detail="Invalid user ID")
         
         # Check if profile exists before deletion
-        existing_profile = services.store.get_user_profile(user_id)
+        existing_profile = await asyncio.to_thread(services.store.get_user_profile, user_id)
         if not existing_profile:
             raise HTTPException(status_code=404, detail="User profile not found")
         
-        services.store.delete_user_profile(user_id)
+        await asyncio.to_thread(services.store.delete_user_profile, user_id)
         return {"message": f"Profile for user {user_id} deleted successfully"}
     except HTTPException:
         raise  # Re-raise HTTP exceptions as-is
@@ -1864,43 +2669,145 @@ async def delete_user_profile(user_id: str):
         raise HTTPException(status_code=500, detail=f"Error deleting profile: {str(e)}")
 
 
+# Probes run concurrently, each bounded by the timeout, so /health takes at most about
+# one timeout. Both model clients are probed, since /chat and /image/edit use different
+# auth and endpoints; their results are reused for a while so readiness probes do not
+# hammer the APIs.
+HEALTH_PROBE_TIMEOUT_SECONDS = float(os.environ.get("HEALTH_PROBE_TIMEOUT_SECONDS", "2"))
+HEALTH_MODEL_PROBE_TTL_SECONDS = float(os.environ.get("HEALTH_MODEL_PROBE_TTL_SECONDS", "30"))
+_model_probe_results: Dict[str, tuple] = {}  # probe name -> (monotonic time, error or None)
+
+async def _probe_sqlite_store():
+    await asyncio.to_thread(services.store.ping)
+
+async def _probe_checkpointer():
+    await services.checkpointer.conn.execute("SELECT 1")
+
+async def _cached_model_probe(name: str, check) -> None:
+    """Run check() at most once per HEALTH_MODEL_PROBE_TTL_SECONDS; re-raise its last error."""
+    now = time.monotonic()
+    last = _model_probe_results.get(name)
+    if last is None or now - last[0] >= HEALTH_MODEL_PROBE_TTL_SECONDS:
+        try:
+            await asyncio.wait_for(check(), HEALTH_PROBE_TIMEOUT_SECONDS)
+            last = (now, None)
+        except Exception as e:
+            last = (now, e)
+        _model_probe_results[name] = last
+    if last[1] is not None:
+        raise last[1]
+
+async def _probe_llm_gemini():
+    # The ChatVertexAI model behind /chat; one output token keeps the call cheap
+    await _cached_model_probe(
+        "llm_gemini", lambda: services.llm_gemini.bind(max_output_tokens=1).ainvoke("ping")
+    )
+
+async def _probe_genai_client():
+    # The google-genai client behind /image/edit; separate auth and endpoint from llm_gemini
+    async def check():
+        if services.genai_client is None:
+            raise RuntimeError("google-genai client not configured")
+        await services.genai_client.aio.models.get(model="gemini-2.5-flash")
+    await _cached_model_probe("genai_client", check)
+
+# A failing critical probe makes /health answer 503 so the pod is taken out of rotation;
+# a model outage only reports "degraded", since every pod would be affected alike
+HEALTH_PROBES = {
+    "sqlite_store": (_probe_sqlite_store, True),
+    "checkpointer": (_probe_checkpointer, True),
+    "llm_gemini": (_probe_llm_gemini, False),
+    "genai_client": (_probe_genai_client, False),
+}
+
 @app.get("/health")
 async def health_check():
-    """Health check endpoint."""
-    return {
-        "status": "healthy",
-        "timestamp": datetime.now().isoformat(),
-        "services": {
-            "llm_groq": "operational",
-            "llm_gemini": "operational",
-            "welfare_search": "operational",
-            "sqlite_store": "operational"
-        }
-    }
+    """Health check endpoint; probes the stores and the model API."""
+    results = await asyncio.gather(
+        *(asyncio.wait_for(probe(), HEALTH_PROBE_TIMEOUT_SECONDS) for probe, _ in HEALTH_PROBES.values()),
+        return_exceptions=True,
+    )
+    checks = {}
+    healthy = True
+    degraded = False
+    for (name, (_, critical)), result in zip(HEALTH_PROBES.items(), results):
+        if isinstance(result, BaseException):
+            reason = "timeout" if isinstance(result, asyncio.TimeoutError) else (str(result) or type(result).__name__)
+            checks[name] = f"degraded: {reason}"
+            healthy = healthy and not critical
+            degraded = True
+        else:
+            checks[name] = "operational"
+    return ORJSONResponse(
+        {
+            "status": "unhealthy" if not healthy else "degraded" if degraded else "healthy",
+            "timestamp": datetime.now().isoformat(),
+            "services": checks,
+        },
+        status_code=200 if healthy else 503,
+    )
 
 @app.get("/db/all")
-async def get_all_db_entries():
-    """Return all rows from key tables. Intended for admin/debug use."""
+async def get_all_db_entries(limit: int = 1000, offset: int = 0):
+    """Return a page of rows from key tables. Intended for admin/debug use."""
+    if limit < 1 or limit > 5000 or offset < 0:
+        raise HTTPException(status_code=400, detail="limit must be 1-5000 and offset >= 0")
     try:
-        data = services.store.get_all_db_entries()
-        # For blobs, avoid huge payloads: include sizes not raw blobs
-        media = data.get("user_generated_media", [])
-        for m in media:
-            blob = m.get("edited_image_blob")
-            if isinstance(blob, (bytes, bytearray)):
-                m["edited_image_blob_size"] = len(blob)
-                m["edited_image_blob"] = None
-        return data
+        # Media rows come back with edited_image_blob_size instead of the raw blob, so every
+        # value is orjson-native; returning the response directly skips FastAPI's
+        # jsonable_encoder walk over every row
+        return ORJSONResponse(await asyncio.to_thread(services.store.get_all_db_entries, limit, offset))
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to fetch DB dump: {str(e)}")
 
+@app.get("/db/all.ndjson")
+async def stream_db_entries(limit: int = 100_000, offset: int = 0):
+    """Stream rows from key tables as NDJSON for admin exports."""
+    if limit < 1 or offset < 0:
+        raise HTTPException(status_code=400, detail="limit must be >= 1 and offset >= 0")
+    # The sync generator is driven from the threadpool, page by page
+    return StreamingResponse(
+        services.store.iter_db_entries_ndjson(limit, offset),
+        media_type="application/x-ndjson",
+    )
+
+# Edited image files are never rewritten under the same name
+_MEDIA_IMAGE_HEADERS = {"Cache-Control": "public, max-age=86400"}
+
+async def _media_image_path(record_id: int, edited_path: Optional[str], has_blob: bool) -> Optional[str]:
+    """Path of a media record's edited image on disk, moving a legacy inline blob to a file first."""
+    if has_blob and not (edited_path and os.path.isfile(edited_path)):
+        try:
+            return await asyncio.to_thread(services.store.move_media_blob_to_file, record_id, EDITED_DIR)
+        except Exception as e:
+            logger.exception("Failed to move media blob %s to disk: %s", record_id, e)
+            return None
+    return edited_path
+
+@app.get("/user/{user_id}/media/{media_id}/image")
+async def get_user_media_image(user_id: str, media_id: int):
+    """Serves the edited image of one media record as a file (cacheable, supports ranges)."""
+    found = await asyncio.to_thread(services.store.get_media_image, user_id, media_id)
+    if not found:
+        raise HTTPException(status_code=404, detail="Media not found")
+    path = await _media_image_path(media_id, *found)
+    if not path or not os.path.isfile(path):
+        raise HTTPException(status_code=404, detail="Image not available")
+    return FileResponse(path, headers=_MEDIA_IMAGE_HEADERS)
+
 @app.get("/user/{user_id}/media")
-async def get_user_media(user_id: str):
-    """List all generated media for a user with small base64 payloads when possible."""
+async def get_user_media(user_id: str, inline: bool = False, limit: int = 100, offset: int = 0):
+    """List a page of generated media for a user, newest first.
+
+    Each item links its edited image via image_url; pass inline=true to also embed it
+    as base64 (the previous behaviour).
+    """
     try:
         if not user_id or not user_id.strip():
             raise HTTPException(status_code=400, detail="Invalid user ID")
-        records = services.store.get_user_media(user_id)
+        if limit < 1 or limit > 500 or offset < 0:
+            raise HTTPException(status_code=400, detail="limit must be 1-500 and offset >= 0")
+        records = await asyncio.to_thread(services.store.get_user_media, user_id, limit, offset)
         result = []
         for r in records:
             out: Dict[str, Any] = {
@@ -1913,66 +2820,128 @@ async def get_user_media(user_id: str):
                 "edited_image_path": r.get("edited_image_path"),
                 "created_at": r.get("created_at"),
             }
-            # Include base64 if we have a blob; else try reading from file path
+            has_image = bool(r.get("edited_image_path") or r.get("has_edited_image_blob"))
+            out["image_url"] = f"/user/{user_id}/media/{r['id']}/image" if has_image else None
+            if not inline:
+                result.append(out)
+                continue
+            # Read the image from disk; records that still hold an inline blob are
+            # moved to a file the first time they are listed
             img_b64 = None
-            blob = r.get("edited_image_blob")
-            if isinstance(blob, (bytes, bytearray)) and len(blob) > 0:
-                try:
-                    img_b64 = base64.b64encode(blob).decode("ascii")
-                except Exception:
-                    img_b64 = None
-            elif r.get("edited_image_path") and os.path.isfile(r["edited_image_path"]):
+            edited_path = await _media_image_path(r["id"], r.get("edited_image_path"), bool(r.get("has_edited_image_blob")))
+            out["edited_image_path"] = edited_path
+            if edited_path and os.path.isfile(edited_path):
                 try:
-                    with open(r["edited_image_path"], "rb") as f:
-                        img_b64 = base64.b64encode(f.read()).decode("ascii")
+                    img_b64 = base64.b64encode(await asyncio.to_thread(read_bytes, edited_path)).decode("ascii")
                 except Exception:
                     img_b64 = None
             out["edited_image_base64"] = img_b64
             result.append(out)
-        return {"user_id": user_id, "count": len(result), "items": result}
+        # Plain str/int/None values; serialized by orjson without the jsonable_encoder pass
+        return ORJSONResponse({"user_id": user_id, "count": len(result), "limit": limit, "offset": offset, "items": result})
     except HTTPException:
         raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to fetch media: {str(e)}")
 
 # =======================
-# 9. WEBSOCKET SUPPORT (OPTIONAL)
+# 9. STREAMING (SSE AND WEBSOCKET)
 # =======================
 
+# Nodes whose LLM output is the user-facing reply; only these are streamed as tokens
+STREAMED_NODES = {"welfare_search", "general_query"}
+
+async def stream_workflow_turn(input_state: Dict, config: Dict):
+    """Run one workflow turn, yielding ("token", text) as reply tokens arrive and finally
+    ("final", state) with the finished graph state."""
+    result = None
+    async for event in services.workflow.astream_events(input_state, config, version="v2"):
+        if (
+            event["event"] == "on_chat_model_stream"
+            and event.get("metadata", {}).get("langgraph_node") in STREAMED_NODES
+        ):
+            token = event["data"]["chunk"].content
+            if isinstance(token, str) and token:
+                yield "token", token
+        elif event["event"] == "on_chain_end" and not event.get("parent_ids"):
+            # The root run's output is the final graph state
+            result = event["data"].get("output")
+    if not isinstance(result, dict):
+        # Only read the checkpoint back if the root event did not carry the state
+        result = (await services.workflow.aget_state(config)).values
+    yield "final", result
+
+@app.post("/chat/stream")
+async def chat_stream_endpoint(chat_message: ChatMessage):
+    """Like /chat, but streams the reply as Server-Sent Events.
+
+    Each token arrives as a `data: {"delta": ...}` frame; a closing `final` event carries
+    the same body /chat returns, or an `error` event carries {"detail": ...}.
+    """
+    config = {"configurable": {"thread_id": chat_message.user_id}}
+    input_state = {
+        "messages": [HumanMessage(content=chat_message.message)],
+        "user_id": chat_message.user_id
+    }
+
+    async def events():
+        try:
+            async for kind, value in stream_workflow_turn(input_state, config):
+                if kind == "token":
+                    yield b"data: " + orjson.dumps({"delta": value}) + b"\n\n"
+                else:
+                    body = await _chat_result_body(chat_message.user_id, value)
+                    yield b"event: final\ndata: " + orjson.dumps(body) + b"\n\n"
+        except Exception as e:
+            logger.exception("Chat stream error: %s", e)
+            yield b"event: error\ndata: " + orjson.dumps({"detail": f"Internal server error: {str(e)}"}) + b"\n\n"
+
+    # no-cache/X-Accel-Buffering keep proxies from holding frames back
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
 @app.websocket("/ws/{user_id}")
 async def websocket_endpoint(websocket: WebSocket, user_id: str):
-    """WebSocket endpoint for real-time chat (optional enhancement)."""
+    """WebSocket endpoint for real-time chat.
+
+    Reply tokens are pushed as {"type": "token"} frames while the LLM generates them,
+    followed by one {"type": "final"} frame with the complete response.
+    """
     await websocket.accept()
     try:
         while True:
             # Receive message from client
             data = await websocket.receive_text()
-            message_data = json.loads(data)
+            message_data = orjson.loads(data)
             
             # Process through workflow (similar to chat endpoint)
+            # Only per-turn fields; onboarding progress is restored from the checkpoint
             initial_state = {
                 "messages": [HumanMessage(content=message_data["message"])],
                 "user_id": user_id,
-                "is_onboarding": False,
-                "onboarding_step": 0,
-                "user_profile_data": {},
-                "intent": "",
-                "tool_output": None,
-                "final_response_text": "",
                 "timestamp": datetime.now().isoformat(),
                 "session_id": str(uuid4())
             }
             
             config = {"configurable": {"thread_id": user_id}}
-            result = services.workflow.invoke(initial_state, config)
+            result = {}
+            async for kind, value in stream_workflow_turn(initial_state, config):
+                if kind == "token":
+                    await websocket.send_text(orjson.dumps({"type": "token", "content": value}).decode())
+                else:
+                    result = value
             
-            # Send response back to client
+            # Send the complete response back to client
             response = {
+                "type": "final",
                 "response": result.get("final_response_text", "Error processing request"),
                 "is_onboarding": result.get("is_onboarding", False),
                 "timestamp": datetime.now().isoformat()
             }
-            await websocket.send_text(json.dumps(response))
+            await websocket.send_text(orjson.dumps(response).decode())
             
     except WebSocketDisconnect:
         print(f"WebSocket disconnected for user: {user_id}")
@@ -1987,10 +2956,16 @@ if __name__ == "__main__":
     print("🌐 Frontend available at: http://localhost:8000")
     print("📖 API Documentation at: http://localhost:8000/docs")
     
+    # uvicorn also reads WEB_CONCURRENCY; reload only works with a single worker
+    workers = int(os.environ.get("WEB_CONCURRENCY", "1"))
     uvicorn.run(
         "agentic_fastapi_app:app",
         host="0.0.0.0",
         port=8080,
-        reload=True,
-        log_level="info"
+        loop="uvloop",
+        http="httptools",
+        workers=workers,
+        reload=workers == 1,
+        ws_per_message_deflate=True,
+        log_level="warning",  # no per-request access lines on stdout
     )
\ No newline at end of file
@@ -0,0 +1,263 @@
+const chatMessages = document.getElementById('chatMessages');
+const messageInput = document.getElementById('messageInput');
+const typingIndicator = document.getElementById('typingIndicator');
+
+let userId = 'user_' + Math.random().toString(36).substr(2, 9);
+
+function addMessage(content, isUser) {
+    const messageDiv = document.createElement('div');
+    messageDiv.className = `message ${isUser ? 'user-message' : 'ai-message'}`;
+    messageDiv.textContent = content;
+
+    chatMessages.appendChild(messageDiv);
+    chatMessages.scrollTop = chatMessages.scrollHeight;
+}
+
+function showTyping() {
+    typingIndicator.style.display = 'block';
+    chatMessages.scrollTop = chatMessages.scrollHeight;
+}
+
+function hideTyping() {
+    typingIndicator.style.display = 'none';
+}
+
+async function sendMessage() {
+    const message = messageInput.value.trim();
+    if (!message) return;
+
+    addMessage(message, true);
+    messageInput.value = '';
+    showTyping();
+
+    // The reply streams in as Server-Sent Events over a POST body (EventSource is GET-only)
+    let replyDiv = null;
+    const setReply = (text) => {
+        if (!replyDiv) {
+            hideTyping();
+            replyDiv = document.createElement('div');
+            replyDiv.className = 'message ai-message';
+            chatMessages.appendChild(replyDiv);
+        }
+        replyDiv.textContent = text;
+        chatMessages.scrollTop = chatMessages.scrollHeight;
+    };
+
+    try {
+        const response = await fetch('/chat/stream', {
+            method: 'POST',
+            headers: { 'Content-Type': 'application/json' },
+            body: JSON.stringify({ message: message, user_id: userId })
+        });
+        if (!response.ok) throw new Error(`HTTP ${response.status}`);
+
+        const reader = response.body.pipeThrough(new TextDecoderStream()).getReader();
+        let buffer = '';
+        let streamed = '';
+        for (;;) {
+            const { value, done } = await reader.read();
+            if (done) break;
+            buffer += value;
+            let sep;
+            while ((sep = buffer.indexOf('\n\n')) !== -1) {
+                const frame = buffer.slice(0, sep);
+                buffer = buffer.slice(sep + 2);
+                const event = (frame.match(/^event: (.*)$/m) || [])[1] || 'message';
+                const data = JSON.parse((frame.match(/^data: (.*)$/m) || [])[1] || '{}');
+                if (event === 'message') {
+                    streamed += data.delta;
+                    setReply(streamed);
+                } else if (event === 'final') {
+                    setReply(data.response);
+                } else if (event === 'error') {
+                    throw new Error(data.detail);
+                }
+            }
+        }
+        if (!replyDiv) throw new Error('Empty response');
+    } catch (error) {
+        hideTyping();
+        if (!replyDiv) addMessage('Sorry, there was an error processing your request.', false);
+        console.error('Error:', error);
+    }
+}
+
+messageInput.addEventListener('keypress', function(e) {
+    if (e.key === 'Enter') sendMessage();
+});
+
+// Focus input on load
+messageInput.focus();
+
+// Image edit handler
+const imageEditForm = document.getElementById('imageEditForm');
+imageEditForm.addEventListener('submit', async (e) => {
+    e.preventDefault();
+    const fileInput = document.getElementById('imageFile');
+    const statusEl = document.getElementById('imageEditStatus');
+    const previewEl = document.getElementById('editedPreview');
+    if (!fileInput.files || fileInput.files.length === 0) {
+        statusEl.textContent = 'Please choose an image file.';
+        return;
+    }
+    statusEl.textContent = 'Editing image...';
+    previewEl.innerHTML = '';
+
+    const formData = new FormData();
+    formData.append('user_id', userId);
+    formData.append('image', fileInput.files[0]);
+
+    try {
+        const resp = await fetch('/image/edit', { method: 'POST', body: formData });
+        const data = await resp.json();
+        if (!resp.ok) throw new Error(data.detail || 'Image edit failed');
+
+        statusEl.textContent = 'Done!';
+        if (data.edited_url || data.image_base64) {
+            const img = document.createElement('img');
+            img.src = data.edited_url || `data:image/png;base64,${data.image_base64}`;
+            img.style.maxWidth = '100%';
+            img.style.border = '1px solid #e5e7eb';
+            img.style.borderRadius = '8px';
+            previewEl.appendChild(img);
+        } else if (data.saved_uploaded_path) {
+            statusEl.textContent = 'Uploaded saved. No edited image returned.';
+        }
+    } catch (err) {
+        console.error(err);
+        statusEl.textContent = 'Error editing image.';
+    }
+});
+
+// Notification functions
+let notificationsLoading = false;
+
+async function showNotifications() {
+    const modal = document.getElementById('notificationModal');
+    const content = document.getElementById('notificationContent');
+
+    modal.style.display = 'block';
+    // Repeated clicks while a request is in flight reuse it instead of refetching
+    if (notificationsLoading) return;
+    notificationsLoading = true;
+    content.innerHTML = '<div class="loading">Loading your personalized recommendations...</div>';
+
+    try {
+        const response = await fetch(`/user/${userId}/notifications`);
+        if (response.ok) {
+            const data = await response.json();
+            displayNotifications(data.notifications);
+        } else if (response.status === 404) {
+            content.innerHTML = `
+                <div style="text-align: center; padding: 40px;">
+                    <h3>Complete Your Profile First</h3>
+                    <p>Please complete the onboarding process to get personalized scheme recommendations.</p>
+                    <button onclick="closeNotifications()" style="background: #4f46e5; color: white; border: none; padding: 10px 20px; border-radius: 8px; cursor: pointer;">
+                        Continue Chat
+                    </button>
+                </div>
+            `;
+        } else {
+            content.innerHTML = '<div class="loading">Error loading recommendations. Please try again.</div>';
+        }
+    } catch (error) {
+        console.error('Error:', error);
+        content.innerHTML = '<div class="loading">Error loading recommendations. Please try again.</div>';
+    } finally {
+        notificationsLoading = false;
+    }
+}
+
+function displayNotifications(notifications) {
+    const content = document.getElementById('notificationContent');
+
+    if (!notifications || notifications.length === 0) {
+        content.innerHTML = '<div class="loading">No recommendations available at this time.</div>';
+        return;
+    }
+
+    // Cards are cloned from a <template> and filled via textContent: no HTML parsing
+    // per card, and scheme text from the server is never interpreted as markup
+    const tpl = document.getElementById('schemeCardTpl');
+    const frag = document.createDocumentFragment();
+
+    const intro = document.createElement('div');
+    intro.style.cssText = 'margin-bottom: 20px; text-align: center; color: #6b7280;';
+    const count = document.createElement('strong');
+    count.textContent = `${notifications.length} Exclusive Benefits`;
+    intro.append('🎯 ', count, ' handpicked for you!');
+    frag.appendChild(intro);
+
+    notifications.forEach((scheme, index) => {
+        const node = tpl.content.cloneNode(true);
+        const card = node.querySelector('.scheme-card');
+        const isTopScheme = index === 0; // Highlight first scheme
+
+        if (scheme.priority) card.classList.add(`priority-${scheme.priority.toLowerCase()}`);
+        if (isTopScheme) {
+            card.classList.add('top-scheme');
+            node.querySelector('.top-badge').hidden = false;
+        }
+        if (scheme.priority === 'High') node.querySelector('.urgent-badge').hidden = false;
+
+        node.querySelector('.scheme-title').textContent = scheme.title;
+        node.querySelector('.scheme-description').textContent = scheme.description;
+        node.querySelector('.scheme-benefit').textContent = `💰 ${scheme.benefit_amount}`;
+        node.querySelector('.scheme-tag').textContent = scheme.category || 'Government Scheme';
+        if (scheme.priority) {
+            const tag = node.querySelector('.priority-tag');
+            tag.classList.add(`priority-${scheme.priority.toLowerCase()}`);
+            tag.textContent = `${scheme.priority} Priority`;
+            tag.hidden = false;
+        }
+        node.querySelector('.scheme-eligibility').textContent = scheme.eligibility;
+        if (scheme.call_to_action) {
+            const cta = node.querySelector('.cta-button');
+            cta.textContent = `${scheme.call_to_action} →`;
+            cta.hidden = false;
+        }
+
+        card.dataset.title = scheme.title;
+        frag.appendChild(node);
+    });
+
+    const tip = document.createElement('div');
+    tip.style.cssText = 'text-align: center; margin-top: 20px; padding: 15px; background: #f8fafc; border-radius: 10px;';
+    tip.innerHTML = '<p style="color: #6b7280; margin: 0;">💡 <strong>Pro Tip:</strong> Apply for multiple schemes to maximize your benefits!</p>';
+    frag.appendChild(tip);
+
+    content.replaceChildren(frag);
+}
+
+// One delegated listener for every scheme card, registered once rather than per render
+document.getElementById('notificationContent').addEventListener('click', (e) => {
+    const card = e.target.closest('.scheme-card');
+    if (card) handleSchemeClick(card.dataset.title);
+});
+
+function handleSchemeClick(schemeTitle) {
+    // Add some interaction feedback
+    console.log('User clicked on scheme:', schemeTitle);
+    // You can add more functionality here like opening application forms
+}
+
+function getPriorityColor(priority) {
+    switch(priority.toLowerCase()) {
+        case 'high': return '#ef4444';
+        case 'medium': return '#f59e0b';
+        case 'low': return '#10b981';
+        default: return '#6b7280';
+    }
+}
+
+function closeNotifications() {
+    document.getElementById('notificationModal').style.display = 'none';
+}
+
+// Close modal when clicking outside
+window.onclick = function(event) {
+    const modal = document.getElementById('notificationModal');
+    if (event.target === modal) {
+        closeNotifications();
+    }
+}
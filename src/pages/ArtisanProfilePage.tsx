@@ -33,14 +33,16 @@ const ArtisanProfilePage = () => {
       })
       .catch(() => setLoading(false));
     // Fetch all product images for this artisan from the media API
-    fetch(`https://agentic-fastapi-app-950029052556.europe-west1.run.app/user/${artisanId}/media`)
+    const mediaUrl = `https://agentic-fastapi-app-950029052556.europe-west1.run.app/user/${artisanId}/media`;
+    fetch(mediaUrl)
       .then(res => res.json())
       .then(media => {
         const images: string[] = [];
         if (media.items && media.items.length > 0) {
           media.items.forEach((item: any, idx: number) => {
-            if (item.edited_image_base64) {
-              const imgData = `data:image/png;base64,${item.edited_image_base64}`;
+            if (item.image_url) {
+              // image_url is relative to the API host
+              const imgData = new URL(item.image_url, mediaUrl).href;
               images.push(imgData);
               // Store in localStorage for reuse elsewhere
               localStorage.setItem(`artisan_gallery_${artisanId}_${idx}`, imgData);
@@ -36,8 +36,9 @@ const ArtisansPage = () => {
             fetch(`${MEDIA_API_BASE}/${userId}/media`)
               .then(res => res.json())
               .then(media => {
-                if (media.items && media.items.length > 0 && media.items[0].edited_image_base64) {
-                  const imgData = `data:image/png;base64,${media.items[0].edited_image_base64}`;
+                if (media.items && media.items.length > 0 && media.items[0].image_url) {
+                  // image_url is relative to the API host
+                  const imgData = new URL(media.items[0].image_url, MEDIA_API_BASE).href;
                   setArtisanImages(prev => ({ ...prev, [userId]: imgData }));
                   localStorage.setItem(`artisan_image_${userId}`, imgData);
                 }
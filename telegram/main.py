@@ -1,11 +1,16 @@
+import asyncio
 import logging
-import requests
 import os
 import io
 import base64
 import json
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import TypedDict
+from urllib.parse import urljoin
+import aiohttp
 from dotenv import load_dotenv
-from telegram import Update, ReplyKeyboardMarkup, ReplyKeyboardRemove
+from telegram import Update, ReplyKeyboardMarkup, ReplyKeyboardRemove, InputMediaPhoto
 from telegram.ext import (
     Application,
     CommandHandler,
@@ -31,33 +36,153 @@ TELEGRAM_BOT_TOKEN = os.getenv("TELEGRAM_BOT_TOKEN")
 CHAT_API_ENDPOINT = os.getenv("CHAT_API_ENDPOINT")
 IMAGE_EDIT_ENDPOINT = os.getenv("IMAGE_EDIT_ENDPOINT")
 GEMINI_API_KEY = os.getenv("GEMINI_API_KEY")
+# Caps on in-flight backend calls across all chats (each story fans out one request per page)
+MAX_IMG_CONCURRENCY = int(os.getenv("MAX_IMG_CONCURRENCY", "8"))
+MAX_CHAT_CONCURRENCY = int(os.getenv("MAX_CHAT_CONCURRENCY", "16"))
+# Image generation (plus the backend's own queueing) routinely outlasts the 30s default
+IMAGE_EDIT_TIMEOUT_SECONDS = float(os.getenv("IMAGE_EDIT_TIMEOUT_SECONDS", "180"))
 
 if GEMINI_API_KEY:
     genai.configure(api_key=GEMINI_API_KEY)
 
+# Shared aiohttp session for all backend calls, so a slow request never blocks other chats.
+# Created in _start_bot (or on first use inside the running loop) and closed in _stop_bot.
+# Idle connections are kept for a minute: onboarding users take longer than aiohttp's 15s
+# default to answer, and each reconnect costs a TCP + TLS handshake to the backend
+_http: aiohttp.ClientSession | None = None
+
+def _get_http() -> aiohttp.ClientSession:
+    global _http
+    if _http is None or _http.closed:
+        _http = aiohttp.ClientSession(
+            timeout=aiohttp.ClientTimeout(total=30),
+            connector=aiohttp.TCPConnector(limit=100, limit_per_host=50, ttl_dns_cache=300, keepalive_timeout=60),
+        )
+    return _http
+
+# Google Cloud clients set up auth and gRPC/HTTP channels on construction; build each once
+_speech_client: speech.SpeechClient | None = None
+_translate_client: translate.Client | None = None
+
+def _get_speech_client() -> speech.SpeechClient:
+    global _speech_client
+    if _speech_client is None:
+        _speech_client = speech.SpeechClient()
+    return _speech_client
+
+def _get_translate_client() -> translate.Client:
+    global _translate_client
+    if _translate_client is None:
+        _translate_client = translate.Client()
+    return _translate_client
+
+_IMG_SEM = asyncio.Semaphore(MAX_IMG_CONCURRENCY)
+_CHAT_SEM = asyncio.Semaphore(MAX_CHAT_CONCURRENCY)
+
+async def post_chat(payload: dict) -> dict:
+    """POSTs a message to the chat API and returns the decoded JSON reply."""
+    async with _CHAT_SEM, _get_http().post(CHAT_API_ENDPOINT, json=payload) as response:
+        response.raise_for_status()
+        return await response.json()
+
 # --- State Definitions ---
 SELECTING_LANGUAGE, SELECTING_ACTION, AWAITING_ONBOARDING_ID, ONBOARDING_QUESTIONS, \
 STORY_AWAITING_USER_ID, STORY_AWAITING_PRODUCT, STORY_AWAITING_HISTORY, \
 STORY_AWAITING_MAKING, STORY_AWAITING_ARTISAN = range(9)
 
 
+@dataclass
+class StoryInputs:
+    """Answers collected by the storybook flow, one field per question."""
+    product: str = ""
+    history: str = ""
+    making: str = ""
+    artisan: str = ""
+
+# --- Keyboards & Filters (built once, shared by every chat) ---
+LANG_KB = ReplyKeyboardMarkup([["English", "हिंदी (Hindi)"]], one_time_keyboard=True)
+ACTION_KB = ReplyKeyboardMarkup([["Complete Onboarding Form"], ["Create a Storybook"]], one_time_keyboard=True)
+LANG_FILTER = filters.Regex(r"^(English|हिंदी \(Hindi\)|english|hindi)$")
+ACTION_FILTER = filters.Regex(r"^(Complete Onboarding Form|Create a Storybook)$")
+TEXT_FILTER = filters.TEXT & ~filters.COMMAND
+TEXT_OR_VOICE_FILTER = (filters.TEXT | filters.VOICE) & ~filters.COMMAND
+
+
 # --- Translation & Reply Helpers ---
 
+# Fixed bot replies; translated in one batch per language at startup so reply() can use
+# a dict lookup instead of a Translate call for them
+STATIC_REPLIES = (
+    "Processing your voice message...",
+    "Sorry, I couldn't understand the audio.",
+    "Sorry, there was an error processing your voice message.",
+    "Story generation is not configured. Please contact an admin.",
+    "I have all the details. Now, I'm writing your story...",
+    "I'm sorry, I had trouble writing the story. Please try again.",
+    "Great! What would you like to do?",
+    "Starting onboarding. First, please provide your User ID.",
+    "Let's create a story! First, please provide your User ID.",
+    "Sorry, I didn't understand that. Please choose an option.",
+    "Could not start onboarding. Please /cancel and try again.",
+    "Error processing your answer. Please /cancel and try again.",
+    "Thank you. First, what is the name of the product or craft? (e.g., 'clay pot', 'Madhubani painting')",
+    "Got it. Now, tell me about the history of this craft. Where did it come from?",
+    "Wonderful. Next, briefly describe how it's made.",
+    "Almost done. Finally, tell me about the artisan or the family who makes it.",
+    "Story complete! Now, I will create the illustrations for each page. This might take a few minutes.",
+    "Your storybook is complete!",
+    "Process canceled. Type /start to begin again.",
+)
+# Every target_language the language picker can set, other than English
+STATIC_REPLY_LANGUAGES = ('hi',)
+_static_translations: dict[str, dict[str, str]] = {}
+
+def pretranslate_static_replies() -> None:
+    """Fills _static_translations with one batched Translate call per language."""
+    for language in STATIC_REPLY_LANGUAGES:
+        try:
+            results = _get_translate_client().translate(list(STATIC_REPLIES), target_language=language)
+        except Exception as e:
+            logger.warning(f"Could not pre-translate replies to {language}: {e}")
+            continue
+        _static_translations[language] = {text: r['translatedText'] for text, r in zip(STATIC_REPLIES, results)}
+
 def translate_text(text: str, target_language: str) -> str:
     # (Translation logic remains the same)
     if not text or target_language == 'en': return text
+    static = _static_translations.get(target_language, {}).get(text)
+    if static is not None: return static
     try:
-        translate_client = translate.Client()
-        result = translate_client.translate(text, target_language=target_language)
-        return result['translatedText']
+        return _translate_cached(text, target_language)
     except Exception as e:
         logger.error(f"Translation error: {e}", exc_info=True)
         return text
 
+@lru_cache(maxsize=4096)
+def _translate_cached(text: str, target_language: str) -> str:
+    """Bot prompts repeat constantly, so each (text, language) pair is translated once.
+    Failures raise and are therefore never cached."""
+    result = _get_translate_client().translate(text, target_language=target_language)
+    return result['translatedText']
+
+def translate_texts(texts: list[str], target_language: str) -> list[str]:
+    """Translates several strings in one API call; returns the originals on error."""
+    if not texts or target_language == 'en': return list(texts)
+    try:
+        results = _get_translate_client().translate(texts, target_language=target_language)
+        return [r['translatedText'] for r in results]
+    except Exception as e:
+        logger.error(f"Translation error: {e}", exc_info=True)
+        return list(texts)
+
 async def reply(update: Update, context: ContextTypes.DEFAULT_TYPE, text: str, **kwargs):
     # (Reply logic remains the same)
     target_language = context.user_data.get('target_language', 'en')
-    translated_text = translate_text(text, target_language)
+    if target_language == 'en' or text in _static_translations.get(target_language, {}):
+        translated_text = translate_text(text, target_language)
+    else:
+        # Dynamic text may need a Translate round trip, which must not stall other chats
+        translated_text = await asyncio.to_thread(translate_text, text, target_language)
     await update.message.reply_text(translated_text, **kwargs)
 
 
@@ -65,10 +190,12 @@ async def reply(update: Update, context: ContextTypes.DEFAULT_TYPE, text: str, *
 async def transcribe_voice(update: Update, context: ContextTypes.DEFAULT_TYPE) -> str | None:
     # (Voice transcription logic remains the same)
     if not update.message.voice: return None
+    # Acknowledge while the clip downloads instead of after it
+    status = asyncio.create_task(reply(update, context, "Processing your voice message..."))
     try:
         voice_file = await context.bot.get_file(update.message.voice.file_id)
         content = await voice_file.download_as_bytearray()
-        client = speech.SpeechClient()
+        client = _get_speech_client()
         audio = speech.RecognitionAudio(content=bytes(content))
         language_code = context.user_data.get('language_code', 'en-US')
         config = speech.RecognitionConfig(
@@ -76,21 +203,59 @@ async def transcribe_voice(update: Update, context: ContextTypes.DEFAULT_TYPE) -
             sample_rate_hertz=48000,
             language_code=language_code,
         )
-        await reply(update, context, "Processing your voice message...")
-        response = client.recognize(config=config, audio=audio)
+        # recognize() is a blocking gRPC call; keep it off the event loop
+        response = await asyncio.to_thread(client.recognize, config=config, audio=audio)
+        await asyncio.gather(status, return_exceptions=True)
         if response.results and response.results[0].alternatives:
             return response.results[0].alternatives[0].transcript
         await reply(update, context, "Sorry, I couldn't understand the audio.")
         return None
     except Exception as e:
         logger.error(f"Transcription error: {e}", exc_info=True)
+        await asyncio.gather(status, return_exceptions=True)
         await reply(update, context, "Sorry, there was an error processing your voice message.")
         return None
 
 # --- Storybook Generation Logic ---
 
-async def generate_storybook_text(story_inputs: dict, update: Update, context: ContextTypes.DEFAULT_TYPE) -> list | None:
-    """Generates the 7-page story text using the Gemini API."""
+class StoryPage(TypedDict):
+    section: str
+    page: int
+    story_text: str
+
+class Storybook(TypedDict):
+    pages: list[StoryPage]
+
+# JSON mode with a schema: Gemini replies with exactly {"pages": [...]}, no prose or code fences
+_STORY_GENERATION_CONFIG = genai.GenerationConfig(
+    response_mime_type="application/json",
+    response_schema=Storybook,
+)
+
+_JSON_DECODER = json.JSONDecoder()
+
+def _parse_streamed_pages(buffer: str, pos: int) -> tuple[list, int]:
+    """Decodes the page objects completed so far in a partial {"pages": [...]} reply.
+    pos is where the previous call stopped (0 on the first call); returns (new pages, pos)."""
+    if pos == 0:
+        key = buffer.find('"pages"')
+        start = buffer.find('[', key) if key != -1 else -1
+        if start == -1: return [], 0
+        pos = start + 1
+    pages = []
+    while True:
+        while pos < len(buffer) and buffer[pos] in ' \t\r\n,': pos += 1
+        if pos >= len(buffer) or buffer[pos] != '{': return pages, pos
+        try:
+            page, pos = _JSON_DECODER.raw_decode(buffer, pos)
+        except json.JSONDecodeError:
+            return pages, pos  # page still incomplete; wait for more text
+        pages.append(page)
+
+async def generate_storybook_text(story_inputs: StoryInputs, update: Update, context: ContextTypes.DEFAULT_TYPE,
+                                  on_page=None) -> list | None:
+    """Generates the 7-page story text using the Gemini API.
+    The reply is streamed; on_page(page) is called for each page as soon as it is complete."""
     if not GEMINI_API_KEY:
         logger.error("GEMINI_API_KEY not configured.")
         await reply(update, context, "Story generation is not configured. Please contact an admin.")
@@ -100,23 +265,32 @@ async def generate_storybook_text(story_inputs: dict, update: Update, context: C
     
     # This prompt is adapted from your main.py
     prompt = f"""
-You are a storybook generator. Create a 7-page storybook and return ONLY valid JSON.
+You are a storybook generator. Create a 7-page storybook.
 Page Flow: Pages 1-2: History, Pages 3-4: Making, Pages 5-6: Artisan, Page 7: Closure.
-For each page, output story_text (2–3 sentences, oral-tale style).
-Return ONLY this JSON format: {{"pages": [{{"section": "History", "page": 1, "story_text": "your narration"}}]}}
+For each page, give its section, page number and story_text (2–3 sentences, oral-tale style).
 
-Product: {story_inputs.get("product")}
-History: {story_inputs.get("history")}
-Making Process: {story_inputs.get("making")}
-About Artisan: {story_inputs.get("artisan")}
+Product: {story_inputs.product}
+History: {story_inputs.history}
+Making Process: {story_inputs.making}
+About Artisan: {story_inputs.artisan}
 """
     try:
         model = genai.GenerativeModel('gemini-1.5-flash')
-        response = await model.generate_content_async(prompt)
-        response_text = response.text.strip().replace("```json", "").replace("```", "")
-        story_data = json.loads(response_text)
+        response = await model.generate_content_async(prompt, generation_config=_STORY_GENERATION_CONFIG, stream=True)
+        buffer, pos, pages = "", 0, []
+        async for chunk in response:
+            buffer += chunk.text if chunk.parts else ""
+            new_pages, pos = _parse_streamed_pages(buffer, pos)
+            for page in new_pages:
+                pages.append(page)
+                if on_page: on_page(page)
+        if not pages:
+            # Nothing decoded page by page; parse the whole reply so a malformed one raises
+            pages = json.loads(buffer).get("pages", [])
+            for page in pages:
+                if on_page: on_page(page)
         logger.info("Successfully generated storybook text from Gemini.")
-        return story_data.get("pages", [])
+        return pages
     except Exception as e:
         logger.error(f"Error calling Gemini API for story text: {e}", exc_info=True)
         await reply(update, context, "I'm sorry, I had trouble writing the story. Please try again.")
@@ -130,44 +304,73 @@ def create_placeholder_image() -> bytes:
     img_bytes.seek(0)
     return img_bytes.getvalue()
 
+# The placeholder never changes, so encode it once rather than for every page
+_PLACEHOLDER_PNG = create_placeholder_image()
+
+# Image prompt pieces, adapted from imagen.py: a per-section scene plus a fixed style suffix
+_BASE_STYLE = "Indian folk-art style like Krish Trish Baltiboy, earthy bright tones, quirky expressions, patterned motifs (tree, sun, river, huts, borders), simplified illustrations"
+_SCENE_TEMPLATES = {
+    "History": "Ancient Indian village scene depicting: {t}",
+    "Making": "Artisan crafting process showing: {t}",
+    "Artisan": "Portrait of artisan and family depicting: {t}",
+}
+_DEFAULT_SCENE_TEMPLATE = "Panoramic mural combining all elements: {t}"
+_PROMPT_SUFFIX = f". {_BASE_STYLE}. Continuation of previous scene, same artisan character."
+
 async def generate_storybook_image(page: dict, user_id: str) -> bytes | None:
     """Generates a single image for a story page using the backend API."""
     if not IMAGE_EDIT_ENDPOINT:
         logger.error("IMAGE_EDIT_ENDPOINT is not configured.")
         return None
         
-    # This prompt logic is adapted from your imagen.py
-    base_style = "Indian folk-art style like Krish Trish Baltiboy, earthy bright tones, quirky expressions, patterned motifs (tree, sun, river, huts, borders), simplified illustrations"
-    section = page.get("section")
-    story_text = page.get("story_text")
-
-    if section == "History": scene = f"Ancient Indian village scene depicting: {story_text}"
-    elif section == "Making": scene = f"Artisan crafting process showing: {story_text}"
-    elif section == "Artisan": scene = f"Portrait of artisan and family depicting: {story_text}"
-    else: scene = f"Panoramic mural combining all elements: {story_text}"
-    
-    prompt = f"{scene}. {base_style}. Continuation of previous scene, same artisan character."
+    template = _SCENE_TEMPLATES.get(page.get("section"), _DEFAULT_SCENE_TEMPLATE)
+    prompt = template.format(t=page.get("story_text")) + _PROMPT_SUFFIX
     
     try:
-        files = {'image': ('placeholder.png', create_placeholder_image(), 'image/png')}
-        data = {'user_id': user_id, 'prompt': prompt}
-        response = requests.post(IMAGE_EDIT_ENDPOINT, files=files, data=data)
-        response.raise_for_status()
-        base64_image = response.json().get("image_base64")
-        if base64_image:
-            return base64.b64decode(base64_image)
-        return None
+        form = aiohttp.FormData()
+        form.add_field('user_id', user_id)
+        form.add_field('prompt', prompt)
+        form.add_field('image', _PLACEHOLDER_PNG, filename='placeholder.png', content_type='image/png')
+        async with _IMG_SEM, _get_http().post(
+            IMAGE_EDIT_ENDPOINT, data=form, timeout=aiohttp.ClientTimeout(total=IMAGE_EDIT_TIMEOUT_SECONDS)
+        ) as response:
+            response.raise_for_status()
+            result = await response.json()
+        # The API links to the saved edit (relative to its own host) and only inlines
+        # base64 when it could not save the file
+        image_url = result.get("edited_url")
+        base64_image = result.get("image_base64")
+        if image_url:
+            async with _get_http().get(urljoin(IMAGE_EDIT_ENDPOINT, image_url)) as image_response:
+                image_response.raise_for_status()
+                image_bytes = await image_response.read()
+        elif base64_image:
+            image_bytes = base64.b64decode(base64_image)
+        else:
+            return None
+        return image_bytes
     except Exception as e:
         logger.error(f"Error generating image for page {page.get('page')}: {e}")
         return None
 
+async def send_photos(context: ContextTypes.DEFAULT_TYPE, chat_id: int, photos: list[tuple[bytes, str]]) -> None:
+    """Sends (image, caption) pairs in order, as albums of up to ten where possible."""
+    for start in range(0, len(photos), 10):
+        batch = photos[start:start + 10]
+        if len(batch) == 1:
+            await context.bot.send_photo(chat_id=chat_id, photo=batch[0][0], caption=batch[0][1])
+        else:
+            await context.bot.send_media_group(
+                chat_id=chat_id,
+                media=[InputMediaPhoto(image, caption=caption) for image, caption in batch],
+            )
+
 # --- Main Bot Conversation Flows ---
 
 async def start(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
     # (Start logic remains the same)
-    reply_keyboard = [["English", "हिंदी (Hindi)"]]
     await update.message.reply_text("Welcome! Please select your language.\n\nकृपया अपनी भाषा चुनें।",
-                                    reply_markup=ReplyKeyboardMarkup(reply_keyboard, one_time_keyboard=True))
+                                    reply_markup=LANG_KB)
     return SELECTING_LANGUAGE
 
 async def handle_language_selection(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
@@ -181,9 +384,8 @@ async def handle_language_selection(update: Update, context: ContextTypes.DEFAUL
         await update.message.reply_text("Please select a valid language.")
         return SELECTING_LANGUAGE
 
-    reply_keyboard = [["Complete Onboarding Form"], ["Create a Storybook"]]
     await reply(update, context, "Great! What would you like to do?",
-                reply_markup=ReplyKeyboardMarkup(reply_keyboard, one_time_keyboard=True))
+                reply_markup=ACTION_KB)
     return SELECTING_ACTION
 
 async def handle_action_selection(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
@@ -205,13 +407,11 @@ async def get_onboarding_id(update: Update, context: ContextTypes.DEFAULT_TYPE)
     context.user_data['onboarding_user_id'] = update.message.text
     api_payload = {"message": f"Start onboarding for user_id: {update.message.text}", "user_id": update.message.text}
     try:
-        response = requests.post(CHAT_API_ENDPOINT, json=api_payload)
-        response.raise_for_status()
-        question = response.json().get("response", "Error getting first question.")
+        question = (await post_chat(api_payload)).get("response", "Error getting first question.")
         context.user_data['last_question'] = question
         await reply(update, context, question)
         return ONBOARDING_QUESTIONS
-    except requests.RequestException as e:
+    except (aiohttp.ClientError, asyncio.TimeoutError) as e:
         logger.error(f"API request error: {e}")
         await reply(update, context, "Could not start onboarding. Please /cancel and try again.")
         return ConversationHandler.END
@@ -227,9 +427,7 @@ async def handle_onboarding_questions(update: Update, context: ContextTypes.DEFA
     user_id = context.user_data.get('onboarding_user_id')
     api_payload = {"message": answer, "user_id": user_id}
     try:
-        response = requests.post(CHAT_API_ENDPOINT, json=api_payload)
-        response.raise_for_status()
-        api_response = response.json()
+        api_response = await post_chat(api_payload)
         next_question = api_response.get("response")
         if not api_response.get("is_onboarding", True):
             await reply(update, context, next_question + "\n\nOnboarding complete!")
@@ -239,7 +437,7 @@ async def handle_onboarding_questions(update: Update, context: ContextTypes.DEFA
             context.user_data['last_question'] = next_question
             await reply(update, context, next_question)
             return ONBOARDING_QUESTIONS
-    except requests.RequestException as e:
+    except (aiohttp.ClientError, asyncio.TimeoutError) as e:
         logger.error(f"API request error: {e}")
         await reply(update, context, "Error processing your answer. Please /cancel and try again.")
         return ConversationHandler.END
@@ -248,28 +446,28 @@ async def handle_onboarding_questions(update: Update, context: ContextTypes.DEFA
 # --- New Storybook Creation Flow ---
 async def get_storybook_user_id(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
     context.user_data['story_user_id'] = update.message.text
-    context.user_data['story_inputs'] = {}
+    context.user_data['story'] = StoryInputs()
     await reply(update, context, "Thank you. First, what is the name of the product or craft? (e.g., 'clay pot', 'Madhubani painting')")
     return STORY_AWAITING_PRODUCT
 
 async def get_storybook_product(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
     answer = update.message.text or await transcribe_voice(update, context)
     if not answer: return STORY_AWAITING_PRODUCT
-    context.user_data['story_inputs']['product'] = answer
+    context.user_data['story'].product = answer
     await reply(update, context, "Got it. Now, tell me about the history of this craft. Where did it come from?")
     return STORY_AWAITING_HISTORY
 
 async def get_storybook_history(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
     answer = update.message.text or await transcribe_voice(update, context)
     if not answer: return STORY_AWAITING_HISTORY
-    context.user_data['story_inputs']['history'] = answer
+    context.user_data['story'].history = answer
     await reply(update, context, "Wonderful. Next, briefly describe how it's made.")
     return STORY_AWAITING_MAKING
 
 async def get_storybook_making(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
     answer = update.message.text or await transcribe_voice(update, context)
     if not answer: return STORY_AWAITING_MAKING
-    context.user_data['story_inputs']['making'] = answer
+    context.user_data['story'].making = answer
     await reply(update, context, "Almost done. Finally, tell me about the artisan or the family who makes it.")
     return STORY_AWAITING_ARTISAN
 
@@ -277,32 +475,56 @@ async def get_storybook_artisan_and_generate(update: Update, context: ContextTyp
     """Gets the final piece of info, then generates the full storybook with images."""
     answer = update.message.text or await transcribe_voice(update, context)
     if not answer: return STORY_AWAITING_ARTISAN
-    context.user_data['story_inputs']['artisan'] = answer
+    context.user_data['story'].artisan = answer
 
     # --- Generation Starts ---
-    story_pages = await generate_storybook_text(context.user_data['story_inputs'], update, context)
+    # Each page is illustrated as soon as its text has streamed in, concurrently with the rest
+    # of the story and the other pages; pages are still sent in page order
+    user_id = context.user_data['story_user_id']
+    image_tasks = []
+    story_pages = await generate_storybook_text(
+        context.user_data['story'], update, context,
+        on_page=lambda page: image_tasks.append(asyncio.create_task(generate_storybook_image(page, user_id))),
+    )
+    if not story_pages:
+        for image_task in image_tasks: image_task.cancel()
 
     if story_pages:
         await reply(update, context, "Story complete! Now, I will create the illustrations for each page. This might take a few minutes.")
-        user_id = context.user_data['story_user_id']
-        
+
+        # Every status line, page label and page text goes through one Translate call;
+        # the results are sent as-is rather than through reply()
+        texts = []
         for page in story_pages:
             page_num = page.get('page')
-            story_text = page.get('story_text')
-            
-            await reply(update, context, f"Generating image for page {page_num}...")
-            image_bytes = await generate_storybook_image(page, user_id)
+            texts += [f"Generating image for page {page_num}...", f"Page {page_num}:", page.get('story_text') or ""]
+        texts.append("(I couldn't create an image for this page.)")
+        translated = await asyncio.to_thread(translate_texts, texts, context.user_data.get('target_language', 'en'))
+        no_image_note = translated[-1]
+        
+        # Illustrated pages are collected and sent as albums, one Bot API call for up to ten
+        # photos instead of one each; a page without an image flushes the album first so
+        # the story stays in order
+        photos = []
+        # Status lines are informational only; they are sent in the background so waiting
+        # for the next image does not also wait on a Telegram round trip
+        status_tasks = []
+        for i, image_task in enumerate(image_tasks):
+            status, page_label, story_text = translated[3 * i:3 * i + 3]
             
-            translated_story_text = translate_text(story_text, context.user_data.get('target_language', 'en'))
+            status_tasks.append(asyncio.create_task(update.message.reply_text(status)))
+            image_bytes = await image_task
 
             if image_bytes:
-                await context.bot.send_photo(
-                    chat_id=update.effective_chat.id,
-                    photo=image_bytes,
-                    caption=f"Page {page_num}:\n\n{translated_story_text}"
-                )
+                photos.append((image_bytes, f"{page_label}\n\n{story_text}"))
             else:
-                await reply(update, context, f"Page {page_num}:\n\n{story_text}\n\n(I couldn't create an image for this page.)")
+                await send_photos(context, update.effective_chat.id, photos)
+                photos = []
+                await update.message.reply_text(f"{page_label}\n\n{story_text}\n\n{no_image_note}")
+        await send_photos(context, update.effective_chat.id, photos)
+        for result in await asyncio.gather(*status_tasks, return_exceptions=True):
+            if isinstance(result, Exception):
+                logger.warning(f"Could not send storybook status message: {result}")
         
         await reply(update, context, "Your storybook is complete!")
     
@@ -321,34 +543,14 @@ def main() -> None:
         logger.error("FATAL: One or more required environment variables are missing.")
         return
 
-    application = Application.builder().token(TELEGRAM_BOT_TOKEN).build()
-    
-    conv_handler = ConversationHandler(
-        entry_points=[CommandHandler("start", start)],
-        states={
-            SELECTING_LANGUAGE: [MessageHandler(filters.Regex("^(English|हिंदी \(Hindi\)|english|hindi)$"), handle_language_selection)],
-            SELECTING_ACTION: [MessageHandler(filters.Regex("^(Complete Onboarding Form|Create a Storybook)$"), handle_action_selection)],
-            # Onboarding States
-            AWAITING_ONBOARDING_ID: [MessageHandler(filters.TEXT & ~filters.COMMAND, get_onboarding_id)],
-            ONBOARDING_QUESTIONS: [MessageHandler((filters.TEXT | filters.VOICE) & ~filters.COMMAND, handle_onboarding_questions)],
-            # Storybook States
-            STORY_AWAITING_USER_ID: [MessageHandler(filters.TEXT & ~filters.COMMAND, get_storybook_user_id)],
-            STORY_AWAITING_PRODUCT: [MessageHandler((filters.TEXT | filters.VOICE) & ~filters.COMMAND, get_storybook_product)],
-            STORY_AWAITING_HISTORY: [MessageHandler((filters.TEXT | filters.VOICE) & ~filters.COMMAND, get_storybook_history)],
-            STORY_AWAITING_MAKING: [MessageHandler((filters.TEXT | filters.VOICE) & ~filters.COMMAND, get_storybook_making)],
-            STORY_AWAITING_ARTISAN: [MessageHandler((filters.TEXT | filters.VOICE) & ~filters.COMMAND, get_storybook_artisan_and_generate)],
-        },
-        fallbacks=[CommandHandler("cancel", cancel)],
-    )
-
-    application.add_handler(conv_handler)
+    pretranslate_static_replies()
+    application = _build_bot_app()
     print("Bot is running with Storybook generation support...")
     application.run_polling()
 
 # --- FastAPI Health App ---
 from fastapi import FastAPI
 import uvicorn
-import asyncio
 
 health_app = FastAPI()
 
@@ -359,24 +561,30 @@ def healthcheck():
 # --- Start Telegram bot polling on FastAPI startup ---
 _bot_app = None  # python-telegram-bot Application
 
-def _build_bot_app():
-    application = Application.builder().token(TELEGRAM_BOT_TOKEN).build()
-    conv_handler = ConversationHandler(
+def _build_conv_handler() -> ConversationHandler:
+    """The bot's single conversation: language, then onboarding or storybook."""
+    return ConversationHandler(
         entry_points=[CommandHandler("start", start)],
         states={
-            SELECTING_LANGUAGE: [MessageHandler(filters.Regex("^(English|हिंदी \(Hindi\)|english|hindi)$"), handle_language_selection)],
-            SELECTING_ACTION: [MessageHandler(filters.Regex("^(Complete Onboarding Form|Create a Storybook)$"), handle_action_selection)],
-            AWAITING_ONBOARDING_ID: [MessageHandler(filters.TEXT & ~filters.COMMAND, get_onboarding_id)],
-            ONBOARDING_QUESTIONS: [MessageHandler((filters.TEXT | filters.VOICE) & ~filters.COMMAND, handle_onboarding_questions)],
-            STORY_AWAITING_USER_ID: [MessageHandler(filters.TEXT & ~filters.COMMAND, get_storybook_user_id)],
-            STORY_AWAITING_PRODUCT: [MessageHandler((filters.TEXT | filters.VOICE) & ~filters.COMMAND, get_storybook_product)],
-            STORY_AWAITING_HISTORY: [MessageHandler((filters.TEXT | filters.VOICE) & ~filters.COMMAND, get_storybook_history)],
-            STORY_AWAITING_MAKING: [MessageHandler((filters.TEXT | filters.VOICE) & ~filters.COMMAND, get_storybook_making)],
-            STORY_AWAITING_ARTISAN: [MessageHandler((filters.TEXT | filters.VOICE) & ~filters.COMMAND, get_storybook_artisan_and_generate)],
+            SELECTING_LANGUAGE: [MessageHandler(LANG_FILTER, handle_language_selection)],
+            SELECTING_ACTION: [MessageHandler(ACTION_FILTER, handle_action_selection)],
+            # Onboarding States
+            AWAITING_ONBOARDING_ID: [MessageHandler(TEXT_FILTER, get_onboarding_id)],
+            ONBOARDING_QUESTIONS: [MessageHandler(TEXT_OR_VOICE_FILTER, handle_onboarding_questions)],
+            # Storybook States
+            STORY_AWAITING_USER_ID: [MessageHandler(TEXT_FILTER, get_storybook_user_id)],
+            STORY_AWAITING_PRODUCT: [MessageHandler(TEXT_OR_VOICE_FILTER, get_storybook_product)],
+            STORY_AWAITING_HISTORY: [MessageHandler(TEXT_OR_VOICE_FILTER, get_storybook_history)],
+            STORY_AWAITING_MAKING: [MessageHandler(TEXT_OR_VOICE_FILTER, get_storybook_making)],
+            STORY_AWAITING_ARTISAN: [MessageHandler(TEXT_OR_VOICE_FILTER, get_storybook_artisan_and_generate)],
         },
         fallbacks=[CommandHandler("cancel", cancel)],
     )
-    application.add_handler(conv_handler)
+
+def _build_bot_app():
+    """Builds the bot Application; used by both main() and the FastAPI startup hook."""
+    application = Application.builder().token(TELEGRAM_BOT_TOKEN).build()
+    application.add_handler(_build_conv_handler())
     return application
 
 @health_app.on_event("startup")
@@ -386,6 +594,14 @@ async def _start_bot():
         logger.error("TELEGRAM_BOT_TOKEN is missing; bot will not start.")
         return
     try:
+        _get_http()
+        # Build the Google clients now rather than on the first user's message
+        try:
+            _get_speech_client()
+            _get_translate_client()
+        except Exception as e:
+            logger.warning(f"Google Cloud clients not initialized at startup: {e}")
+        await asyncio.to_thread(pretranslate_static_replies)
         _bot_app = _build_bot_app()
         await _bot_app.initialize()
         await _bot_app.start()
@@ -406,6 +622,8 @@ async def _stop_bot():
             logger.info("Telegram bot stopped successfully")
         except Exception as e:
             logger.error(f"Error stopping Telegram bot: {e}", exc_info=True)
+    if _http is not None and not _http.closed:
+        await _http.close()
 
 if __name__ == "__main__":
     main()